@@ -0,0 +1,93 @@
+"""Async entry points of the hot read endpoints for ASGI servers.
+
+Django 3.2 has no async ORM and DRF has no async views, while under ASGI
+Django runs every sync view on one shared thread, so a slow request holds
+up all others. The async views here hand GET and HEAD requests of the
+regular viewsets to a pool of ASYNC_READ_WORKERS threads and render the
+response there; other methods stay on the shared thread. The viewsets do
+the work, so the responses are the ones of the sync views.
+"""
+import asyncio
+import contextvars
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+ASYNC_ROUTES = (
+    'recipes-list',
+    'recipes-detail',
+    'ingredients-list',
+    'ingredients-detail',
+    'tags-list',
+    'tags-detail',
+)
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+@lru_cache()
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.ASYNC_READ_WORKERS,
+        thread_name_prefix='async-read',
+    )
+
+
+def render_view(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def read_in_thread(view, request, *args, **kwargs):
+    """Serve a request in a pool thread, connections as for a request."""
+    close_old_connections()
+    try:
+        return render_view(view, request, *args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def as_async_view(view):
+    write = sync_to_async(
+        functools.partial(render_view, view), thread_sensitive=True
+    )
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if (
+            request.method not in SAFE_METHODS
+            or not settings.ASYNC_READ_WORKERS
+        ):
+            return await write(request, *args, **kwargs)
+        # the request context carries the replica routing state
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            get_executor(),
+            functools.partial(
+                context.run, read_in_thread, view, request, *args, **kwargs
+            ),
+        )
+
+    return async_view
+
+
+def get_async_urls(urls, names=ASYNC_ROUTES):
+    """Copy router urls, serving the named routes with async views."""
+    return [
+        URLPattern(
+            pattern.pattern,
+            as_async_view(pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        if pattern.name in names
+        else pattern
+        for pattern in urls
+    ]
@@ -0,0 +1,122 @@
+"""Background shopping list exports.
+
+Jobs are rows of ShoppingCartExport, so no broker is needed. A job is
+claimed with a conditional UPDATE, which lets the in-process thread pool
+and the process_exports command run side by side without rendering the
+same job twice. The command also queues again jobs whose worker died and
+deletes expired exports with their files.
+"""
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.utils import get_shopping_cart_pdf
+from recipes.models import ShoppingCartExport
+
+
+@lru_cache()
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.SHOPPING_CART_EXPORT_WORKERS,
+        thread_name_prefix='shopping-cart-export',
+    )
+
+
+def claim_export(export_id):
+    return ShoppingCartExport.objects.filter(
+        pk=export_id, status=ShoppingCartExport.PENDING
+    ).update(
+        status=ShoppingCartExport.RUNNING,
+        claimed=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+
+
+def process_export(export_id):
+    """Render a pending export, return False if it was already claimed."""
+    if not claim_export(export_id):
+        return False
+    export = ShoppingCartExport.objects.select_related('user').get(
+        pk=export_id
+    )
+    try:
+        export.file.save(
+            f'{uuid.uuid4().hex}.pdf',
+            ContentFile(get_shopping_cart_pdf(export.user)),
+            save=False,
+        )
+        export.status = ShoppingCartExport.DONE
+    except Exception as error:
+        export.status = ShoppingCartExport.FAILED
+        export.error = str(error)
+    export.save(update_fields=('file', 'status', 'error'))
+    return True
+
+
+def run_export(export_id):
+    try:
+        process_export(export_id)
+    finally:
+        connection.close()
+
+
+def create_export(user):
+    """Queue an export and hand it to the worker pool after commit."""
+    export = ShoppingCartExport.objects.create(user=user)
+    if settings.SHOPPING_CART_EXPORT_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_export, export.pk)
+        )
+    return export
+
+
+def process_pending_exports():
+    """Render every pending export in this process, oldest first."""
+    pending = ShoppingCartExport.objects.filter(
+        status=ShoppingCartExport.PENDING
+    ).values_list('pk', flat=True)
+    return sum(process_export(export_id) for export_id in pending)
+
+
+def recover_stuck_exports():
+    """Queue again exports left running by a dead worker.
+
+    Return (requeued, failed), jobs out of attempts are failed.
+    """
+    stuck = ShoppingCartExport.objects.filter(
+        status=ShoppingCartExport.RUNNING,
+        claimed__lt=timezone.now()
+        - timedelta(seconds=settings.SHOPPING_CART_EXPORT_TIMEOUT),
+    )
+    failed = stuck.filter(
+        attempts__gte=settings.SHOPPING_CART_EXPORT_ATTEMPTS
+    ).update(
+        status=ShoppingCartExport.FAILED,
+        error='Export was interrupted',
+    )
+    requeued = stuck.update(status=ShoppingCartExport.PENDING)
+    return requeued, failed
+
+
+def delete_expired_exports():
+    """Delete finished exports older than the TTL with their files."""
+    expired = ShoppingCartExport.objects.filter(
+        status__in=(ShoppingCartExport.DONE, ShoppingCartExport.FAILED),
+        created__lt=timezone.now()
+        - timedelta(seconds=settings.SHOPPING_CART_EXPORT_TTL),
+    )
+    deleted = 0
+    for export in expired.iterator():
+        if export.file:
+            export.file.delete(save=False)
+        export.delete()
+        deleted += 1
+    return deleted
@@ -0,0 +1,163 @@
+"""Values based serializers of the hot list endpoints.
+
+The DRF serializers build a field tree and model instances for every row.
+With FAST_LIST_SERIALIZERS the recipe list, the ingredient list and the
+subscriptions read plain values instead and assemble the same dicts in one
+pass. They mirror api.serializers field for field, test_fast_serializers
+compares the output of both on a seeded dataset.
+"""
+from recipes.models import Recipe, RecipeIngredient, RecipeTag
+from recipes.relations import get_relations
+from recipes.renditions import get_rendition_files
+
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit__name')
+RECIPE_FIELDS = (
+    'id',
+    'name',
+    'text',
+    'cooking_time',
+    'image',
+    'image_renditions',
+    'pub_date',
+    'author_id',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'author__email',
+)
+USER_FIELDS = (
+    'id',
+    'username',
+    'first_name',
+    'last_name',
+    'email',
+    'recipes_count',
+)
+
+
+def get_url(name, request=None):
+    """Url of a stored image as ImageField renders it."""
+    url = Recipe._meta.get_field('image').storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def get_image_urls(image, renditions, request=None):
+    return {
+        name: get_url(file_name, request)
+        for name, file_name in get_rendition_files(image, renditions).items()
+    }
+
+
+def serialize_ingredients(queryset):
+    return [
+        {'id': pk, 'name': name, 'measurement_unit': unit}
+        for pk, name, unit in queryset.values_list(*INGREDIENT_FIELDS)
+    ]
+
+
+def get_recipe_tags(recipe_ids):
+    tags = {}
+    recipe_tags = {}
+    for recipe_id, tag_id, name, color, slug in (
+        RecipeTag.objects.filter(recipe_id__in=recipe_ids)
+        .order_by('tag_id')
+        .values_list(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+        )
+    ):
+        if tag_id not in tags:
+            tags[tag_id] = {
+                'id': tag_id, 'name': name, 'color': color, 'slug': slug
+            }
+        recipe_tags.setdefault(recipe_id, []).append(tags[tag_id])
+    return recipe_tags
+
+
+def get_recipe_ingredients(recipe_ids):
+    ingredients = {}
+    for recipe_id, pk, name, unit, amount in (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by('id')
+        .values_list(
+            'recipe_id',
+            'ingredient_id',
+            'ingredient__name',
+            'ingredient__measurement_unit__name',
+            'amount',
+        )
+    ):
+        ingredients.setdefault(recipe_id, []).append(
+            {
+                'id': pk,
+                'name': name,
+                'measurement_unit': unit,
+                'amount': amount,
+            }
+        )
+    return ingredients
+
+
+def serialize_recipes(rows, request):
+    """RecipeSerializer output for rows of RECIPE_FIELDS values."""
+    recipe_ids = [row['id'] for row in rows]
+    tags = get_recipe_tags(recipe_ids)
+    ingredients = get_recipe_ingredients(recipe_ids)
+    relations = get_relations(request.user)
+    return [
+        {
+            'id': row['id'],
+            'author': {
+                'id': row['author_id'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+                'email': row['author__email'],
+                'is_subscribed': row['author_id'] in relations.follows,
+            },
+            'tags': tags.get(row['id'], []),
+            'image_renditions': get_image_urls(
+                row['image'], row['image_renditions'], request
+            ),
+            'is_favorited': row['id'] in relations.favorites,
+            'is_in_shopping_cart': row['id'] in relations.cart,
+            'ingredients': ingredients.get(row['id'], []),
+            'name': row['name'],
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+            'image': get_url(row['image'], request) if row['image'] else None,
+        }
+        for row in rows
+    ]
+
+
+def serialize_short_recipe(recipe):
+    """RecipeFavoriteSerializer output, it has no request for urls."""
+    image = recipe.image.name
+    return {
+        'id': recipe.id,
+        'name': recipe.name,
+        'image': get_url(image) if image else None,
+        'image_renditions': get_image_urls(image, recipe.image_renditions),
+        'cooking_time': recipe.cooking_time,
+    }
+
+
+def serialize_subscriptions(rows, latest_recipes, request):
+    """SubscriptionSerializer output for rows of USER_FIELDS values."""
+    follows = get_relations(request.user).follows
+    return [
+        {
+            'id': row['id'],
+            'username': row['username'],
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+            'email': row['email'],
+            'is_subscribed': row['id'] in follows,
+            'recipes': [
+                serialize_short_recipe(recipe)
+                for recipe in latest_recipes[row['id']]
+            ],
+            'recipes_count': row['recipes_count'],
+        }
+        for row in rows
+    ]
@@ -1,18 +1,27 @@
 import django_filters
 
-from recipes.models import Recipe, Tag
+from django.db.models import Exists, OuterRef, Q
+
+from recipes.models import Favorite, Recipe, RecipeTag, ShoppingList, Tag
+from recipes.relations import get_relations
 
 FILTER_CHOICES = (('0', False), ('1', True))
+# longer id lists are matched with EXISTS instead of IN (...)
+MAX_IN_IDS = 500
 
 
-def get_filtered_queryset(queryset, recipes, value):
-    return (
-        queryset.filter(id__in=recipes)
-        if dict(FILTER_CHOICES)[value]
-        else queryset.exclude(id__in=recipes)
+def get_filtered_queryset(queryset, condition, value):
+    return queryset.filter(
+        condition if dict(FILTER_CHOICES)[value] else ~condition
     )
 
 
+def get_relation_condition(recipes, model, user):
+    if len(recipes) <= MAX_IN_IDS:
+        return Q(id__in=list(recipes))
+    return Exists(model.objects.filter(user=user, recipe=OuterRef('pk')))
+
+
 class RecipeFilter(django_filters.FilterSet):
     is_favorited = django_filters.ChoiceFilter(
         choices=FILTER_CHOICES, method='is_favorited_method'
@@ -26,15 +35,28 @@ class RecipeFilter(django_filters.FilterSet):
         user = self.request.user
         if user.is_anonymous:
             return Recipe.objects.none()
-        recipes = user.favorites.values('recipe__id')
-        return get_filtered_queryset(queryset, recipes, value)
+        condition = get_relation_condition(
+            get_relations(user).favorites, Favorite, user
+        )
+        return get_filtered_queryset(queryset, condition, value)
 
     def is_in_shopping_cart_method(self, queryset, name, value):
         user = self.request.user
         if user.is_anonymous:
             return Recipe.objects.none()
-        recipes = user.shopping_list.values('recipe__id')
-        return get_filtered_queryset(queryset, recipes, value)
+        condition = get_relation_condition(
+            get_relations(user).cart, ShoppingList, user
+        )
+        return get_filtered_queryset(queryset, condition, value)
+
+    def tags_method(self, queryset, name, tags):
+        if not tags:
+            return queryset
+        return queryset.filter(
+            Exists(
+                RecipeTag.objects.filter(recipe=OuterRef('pk'), tag__in=tags)
+            )
+        )
 
     author = django_filters.NumberFilter(
         field_name='author', lookup_expr='exact'
@@ -43,6 +65,7 @@ class RecipeFilter(django_filters.FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='tags_method',
     )
 
     class Meta:
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from api.utils import get_etag, is_not_modified
+from recipes.versions import get_catalogue_version
+
+
+class CatalogueCacheMixin:
+    """Versioned caching and conditional GET for public catalogue views.
+
+    Responses do not depend on the user, so they are cached rendered under
+    a digest of the catalogue version, media type and path, query strings
+    are not read by these views. The digest is the cache key and the ETag,
+    which lets If-None-Match requests get a 304 without any database work.
+    """
+
+    def perform_authentication(self, request):
+        """Authenticate lazily, catalogue views never look at the user."""
+
+    def get_catalogue_key(self, request):
+        return ':'.join(
+            (
+                'catalogue',
+                get_catalogue_version(),
+                request.accepted_media_type,
+                request.path,
+            )
+        )
+
+    def cached_response(self, request, view, *args, **kwargs):
+        if request.accepted_renderer.format == 'api':
+            return view(request, *args, **kwargs)
+        etag = get_etag(self.get_catalogue_key(request))
+        key = 'catalogue:{}'.format(etag.strip('"'))
+        if is_not_modified(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            content = cache.get(key)
+            if content is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                content = request.accepted_renderer.render(
+                    response.data,
+                    request.accepted_media_type,
+                    self.get_renderer_context(),
+                )
+                cache.set(key, content, settings.CATALOGUE_CACHE_TIMEOUT)
+            response = HttpResponse(
+                content, content_type=request.accepted_media_type
+            )
+        response['ETag'] = etag
+        patch_cache_control(
+            response, public=True, max_age=settings.CATALOGUE_MAX_AGE
+        )
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
@@ -1,7 +1,124 @@
+import base64
+import json
+
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPageNumberPagination(PageNumberPagination):
+    """Page number pagination with an opt-in keyset (cursor) mode.
+
+    Passing ``cursor`` (empty for the first page) switches to keyset
+    pagination over the view's ``keyset_ordering``: no COUNT and no OFFSET,
+    so deep pages cost the same as the first one.
+    """
+
     page_size = 6
     page_size_query_param = 'limit'
     max_page_size = 24
+    cursor_query_param = 'cursor'
+    keyset_ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', self.keyset_ordering)
+        page_size = self.get_page_size(request)
+        cursor = request.query_params[self.cursor_query_param]
+        queryset = queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(
+                self.get_keyset_filter(queryset.model, cursor)
+            )
+        page = list(queryset[: page_size + 1])
+        self.next_position = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_position = self.get_position(page[-1])
+        return page
+
+    @staticmethod
+    def get_field_name(ordering):
+        return ordering.lstrip('-')
+
+    def get_position(self, instance):
+        if isinstance(instance, dict):
+            return [
+                instance[self.get_field_name(ordering)]
+                for ordering in self.ordering
+            ]
+        return [
+            getattr(instance, self.get_field_name(ordering))
+            for ordering in self.ordering
+        ]
+
+    def encode_cursor(self, position):
+        # str() keeps microseconds that DjangoJSONEncoder would drop
+        return base64.urlsafe_b64encode(
+            json.dumps(position, default=str).encode()
+        ).decode()
+
+    def decode_cursor(self, model, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            fields = [
+                model._meta.get_field(self.get_field_name(ordering))
+                for ordering in self.ordering
+            ]
+            return [
+                field.to_python(value) for field, value in zip(fields, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_keyset_filter(self, model, cursor):
+        """Rows after the cursor position in the keyset ordering.
+
+        (a, b) > (x, y) is expanded to a >= x AND (a > x OR a = x AND b > y)
+        so the planner can walk the composite index from the position.
+        """
+        position = self.decode_cursor(model, cursor)
+        condition = Q()
+        equal = Q()
+        for ordering, value in zip(self.ordering, position):
+            name = self.get_field_name(ordering)
+            lookup = 'lt' if ordering.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first = self.get_field_name(self.ordering[0])
+        lookup = 'lte' if self.ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{first}__{lookup}': position[0]}) & condition
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(
+            OrderedDict(
+                (
+                    ('next', self.get_next_link()),
+                    ('previous', None),
+                    ('results', data),
+                )
+            )
+        )
@@ -0,0 +1,88 @@
+"""orjson and MessagePack renderers.
+
+ORJSONRenderer returns the bytes JSONRenderer returns with the default
+settings (compact, UTF-8, U+2028 and U+2029 escaped). Types orjson does not
+know, and datetimes it would format differently, go through DRF's
+JSONEncoder; indented output and data orjson refuses, such as integers
+wider than 64 bits, are left to JSONRenderer. orjson writes NaN and
+Infinity as null, so data holding them is left to JSONRenderer as well,
+which raises under STRICT_JSON. The only difference left is the exponent
+of tiny and huge floats (1e-7 and 1e16 instead of 1e-07 and 1e+16), the
+API has no float fields.
+"""
+from decimal import Decimal
+
+import orjson
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is optional
+    msgpack = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+)
+LINE_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+
+def has_non_finite(data):
+    """Whether the data holds a NaN or an infinite float or Decimal."""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, (float, Decimal)):
+            if not Decimal(value).is_finite():
+                return True
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=ORJSON_OPTIONS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # non-finite numbers are the only source of null besides None
+        if b'null' in content and has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        for separator, escaped in LINE_SEPARATORS:
+            if separator in content:
+                content = content.replace(separator, escaped)
+        return content
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Served to clients that ask for application/msgpack."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    encoder_class = JSONRenderer.encoder_class
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(
+            data, default=self.encoder_class().default, use_bin_type=True
+        )
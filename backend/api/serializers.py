@@ -1,10 +1,15 @@
+from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from api.utils import create_recipe_ingredients
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from api.utils import create_recipe_ingredients, update_recipe_ingredients
+from recipes.models import (
+    Ingredient, Recipe, RecipeIngredient, ShoppingCartExport, Tag,
+)
+from recipes.relations import get_relations
+from recipes.renditions import get_renditions
 from users.serializers import CustomUserSerializer
 
 
@@ -24,10 +29,29 @@ class TagSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """Urls of the recipe image renditions by rendition name."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        request = self.context.get('request')
+        storage = recipe.image.storage
+        urls = {}
+        for name, file_name in get_renditions(recipe).items():
+            url = storage.url(file_name)
+            urls[name] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
 class RecipeFavoriteSerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
 
 
 class RecipeIngredientsSerializer(serializers.ModelSerializer):
@@ -52,6 +76,7 @@ class RecipeIngredientsSerializer(serializers.ModelSerializer):
 class RecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     tags = TagSerializer(many=True)
+    image_renditions = ImageRenditionsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     ingredients = serializers.SerializerMethodField()
@@ -64,25 +89,15 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, obj):
         user = self.context['request'].user
-
-        return (
-            obj.in_favorite.filter(user_id=user.id).exists()
-            if not user.is_anonymous
-            else False
-        )
+        return obj.id in get_relations(user).favorites
 
     def get_is_in_shopping_cart(self, obj):
         user = self.context['request'].user
-
-        return (
-            obj.in_shopping_list.filter(user_id=user.id).exists()
-            if not user.is_anonymous
-            else False
-        )
+        return obj.id in get_relations(user).cart
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date',)
+        exclude = ('pub_date', 'favorites_count', 'in_carts_count')
 
 
 class CreateUpdateRecipeIngredientSerializer(serializers.ModelSerializer):
@@ -144,6 +159,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         create_recipe_ingredients(ingredients_data, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         if tags is not None:
@@ -151,8 +167,7 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
 
         ingredients = validated_data.pop('ingredients', None)
         if ingredients is not None:
-            instance.ingredients.clear()
-        create_recipe_ingredients(ingredients, instance)
+            update_recipe_ingredients(ingredients, instance)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
@@ -164,4 +179,18 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date',)
+        exclude = ('pub_date', 'favorites_count', 'in_carts_count')
+
+
+class ShoppingCartExportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShoppingCartExport
+        fields = ('id', 'status', 'file', 'error', 'created')
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPES_BULK_MAX_SIZE,
+    )
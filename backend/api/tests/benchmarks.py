@@ -0,0 +1,301 @@
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, RecipeTag, ShoppingList,
+    Tag, Unit,
+)
+from users.models import Follow
+
+User = get_user_model()
+
+BUDGETS_PATH = Path(__file__).resolve().parent / 'benchmark_budgets.json'
+BENCHMARK_RECIPES = int(os.getenv('BENCHMARK_RECIPES', 2000))
+BENCHMARK_REPEAT = int(os.getenv('BENCHMARK_REPEAT', 3))
+BENCHMARK_OUTPUT = os.getenv('BENCHMARK_OUTPUT')
+# wall time and memory depend on the machine, only query counts are
+# enforced unless asked for, e.g. on a dedicated benchmark runner
+BENCHMARK_ENFORCE_TIMINGS = (
+    os.getenv('BENCHMARK_ENFORCE_TIMINGS', '') == 'True'
+)
+TIMING_METRICS = ('time_ms', 'peak_kb')
+BENCHMARK_SEED = 42
+BATCH_SIZE = 1000
+
+
+def seed_dataset(recipes=BENCHMARK_RECIPES, seed=BENCHMARK_SEED):
+    """Create a realistic dataset and return ids used by the routes."""
+    rnd = random.Random(seed)
+    users_count = max(recipes // 10, 10)
+    Unit.objects.bulk_create(
+        Unit(name=name) for name in ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.')
+    )
+    unit_ids = list(Unit.objects.values_list('id', flat=True))
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(
+                name=f'ингредиент {num}',
+                measurement_unit_id=unit_ids[num % len(unit_ids)],
+            )
+            for num in range(max(recipes // 4, 50))
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    Tag.objects.bulk_create(
+        Tag(name=name, color='#E26C2D', slug=slug)
+        for name, slug in (
+            ('Завтрак', 'breakfast'),
+            ('Обед', 'lunch'),
+            ('Ужин', 'dinner'),
+        )
+    )
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+    User.objects.bulk_create(
+        (
+            User(
+                username=f'bench_user_{num}',
+                email=f'bench_user_{num}@mail.com',
+                first_name=f'Имя{num}',
+                last_name=f'Фамилия{num}',
+                password='!',
+            )
+            for num in range(users_count)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(User.objects.values_list('id', flat=True))
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                name=f'Рецепт {num}',
+                text=f'Описание рецепта {num}',
+                cooking_time=rnd.randint(1, 120),
+                image='recipes/images/benchmark.gif',
+                author_id=user_ids[num % users_count],
+            )
+            for num in range(recipes)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    RecipeTag.objects.bulk_create(
+        (
+            RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rnd.sample(tag_ids, rnd.randint(1, len(tag_ids)))
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    RecipeIngredient.objects.bulk_create(
+        (
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rnd.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rnd.sample(ingredient_ids, rnd.randint(3, 12))
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    # the first user is the one the benchmark authenticates as; the last
+    # recipe is kept out of their favorites and cart for the toggle routes
+    toggle_recipe_id = recipe_ids[-1]
+    Favorite.objects.bulk_create(
+        (
+            Favorite(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in rnd.sample(recipe_ids[:-1], 20)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    ShoppingList.objects.bulk_create(
+        (
+            ShoppingList(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in rnd.sample(recipe_ids[:-1], 10)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    bench_user_id = user_ids[0]
+    toggle_author_id = user_ids[-1]
+    follows_sample = min(31, users_count - 1)
+    Follow.objects.bulk_create(
+        (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in [
+                author_id
+                for author_id in rnd.sample(user_ids[:-1], follows_sample)
+                if author_id != user_id
+            ][:30]
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    return {
+        'user_id': bench_user_id,
+        'recipe_id': recipe_ids[len(recipe_ids) // 2],
+        'toggle_recipe_id': toggle_recipe_id,
+        'author_id': toggle_author_id,
+        'ingredient_name': 'ингредиент 1',
+    }
+
+
+def get_routes(ids):
+    """Return (name, method, url) for every route in api/urls.py."""
+    recipe = f'/api/recipes/{ids["recipe_id"]}/'
+    toggle = f'/api/recipes/{ids["toggle_recipe_id"]}/'
+    author = f'/api/users/{ids["author_id"]}/'
+    return (
+        ('ingredients_list', 'get', '/api/ingredients/'),
+        (
+            'ingredients_search',
+            'get',
+            f'/api/ingredients/?name={ids["ingredient_name"][:4]}',
+        ),
+        ('tags_list', 'get', '/api/tags/'),
+        ('recipes_list', 'get', '/api/recipes/?limit=24'),
+        ('recipes_detail', 'get', recipe),
+        (
+            'recipes_filter_tags',
+            'get',
+            '/api/recipes/?limit=24&tags=breakfast&tags=lunch',
+        ),
+        (
+            'recipes_filter_author',
+            'get',
+            f'/api/recipes/?limit=24&author={ids["author_id"]}',
+        ),
+        (
+            'recipes_filter_is_favorited',
+            'get',
+            '/api/recipes/?limit=24&is_favorited=1',
+        ),
+        (
+            'recipes_filter_is_in_shopping_cart',
+            'get',
+            '/api/recipes/?limit=24&is_in_shopping_cart=1',
+        ),
+        ('favorite_add', 'post', f'{toggle}favorite/'),
+        ('favorite_remove', 'delete', f'{toggle}favorite/'),
+        ('shopping_cart_add', 'post', f'{toggle}shopping_cart/'),
+        ('shopping_cart_remove', 'delete', f'{toggle}shopping_cart/'),
+        (
+            'download_shopping_cart',
+            'get',
+            '/api/recipes/download_shopping_cart/',
+        ),
+        ('users_list', 'get', '/api/users/?limit=24'),
+        ('users_me', 'get', '/api/users/me/'),
+        ('users_detail', 'get', author),
+        (
+            'subscriptions',
+            'get',
+            '/api/users/subscriptions/?limit=24&recipes_limit=3',
+        ),
+        ('subscribe', 'post', f'{author}subscribe/'),
+        ('unsubscribe', 'delete', f'{author}subscribe/'),
+    )
+
+
+def measure(client, method, url, trace=False):
+    """Return status, SQL query count and wall time or peak memory."""
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url)
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+    elapsed = time.perf_counter() - start
+    metrics = {
+        'status': response.status_code,
+        'queries': len(context.captured_queries),
+        'time_ms': round(elapsed * 1000, 3),
+    }
+    if trace:
+        metrics['peak_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    return metrics
+
+
+def run_routes(client, routes, repeat=BENCHMARK_REPEAT):
+    """Measure every route and keep the median timing of ``repeat`` passes.
+
+    Memory is traced in a separate first pass so tracemalloc overhead does
+    not distort the timings. Routes come in add/remove pairs, so every pass
+    restores the state the next one starts from.
+    """
+    results = {}
+    for name, method, url in routes:
+        traced = measure(client, method, url, trace=True)
+        results[name] = {
+            'method': method.upper(),
+            'url': url,
+            'status': traced['status'],
+            'queries': traced['queries'],
+            'peak_kb': traced['peak_kb'],
+            'timings': [],
+        }
+    for _ in range(repeat):
+        for name, method, url in routes:
+            results[name]['timings'].append(
+                measure(client, method, url)['time_ms']
+            )
+    for metrics in results.values():
+        metrics['time_ms'] = statistics.median(metrics.pop('timings'))
+    return results
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path, encoding='utf-8') as budgets_file:
+        return json.load(budgets_file)
+
+
+def get_budget_violations(
+    results, budgets, enforce_timings=BENCHMARK_ENFORCE_TIMINGS
+):
+    """Return human readable messages for every exceeded budget."""
+    violations = []
+    for name, metrics in results.items():
+        for metric, limit in budgets.get(name, {}).items():
+            if metric in TIMING_METRICS and not enforce_timings:
+                continue
+            if metrics[metric] > limit:
+                violations.append(
+                    f'{name}: {metric} {metrics[metric]} > budget {limit}'
+                )
+    return violations
+
+
+def write_report(results, section='routes', path=BENCHMARK_OUTPUT, **meta):
+    """Dump results as JSON so trends can be tracked across releases.
+
+    Every benchmark writes its own section of the same report file.
+    """
+    if not path:
+        return
+    try:
+        with open(path, encoding='utf-8') as report_file:
+            report = json.load(report_file)
+    except (OSError, ValueError):
+        report = {}
+    report.update(
+        vendor=connection.vendor,
+        timestamp=time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        **meta,
+    )
+    report[section] = results
+    with open(path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, ensure_ascii=False, indent=2)
@@ -4,12 +4,14 @@ import tempfile
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 
 from recipes.models import (
     Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag, Unit,
 )
+from users.authentication import token_cache
 
 User = get_user_model()
 
@@ -30,7 +32,7 @@ def image(image_name: str):
     )
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_RENDITION_WORKERS=0)
 class RecipeTest(TestCase):
     """Class to test post creation and editing"""
 
@@ -41,6 +43,8 @@ class RecipeTest(TestCase):
 
     def get_client(self):
         """Returns a client instance"""
+        cache.clear()
+        token_cache.clear()
         if self.user:
             self.authorized_client = Client()
             self.authorized_client.force_login(self.user)
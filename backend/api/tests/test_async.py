@@ -0,0 +1,89 @@
+import asyncio
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+
+from api.tests.fixtures import RecipeTest, get_objects_instances_to_test
+from recipes.models import Favorite, Ingredient, Recipe, Tag
+from users.models import User
+
+ASYNC_URLCONF = 'api.tests.async_urls'
+
+
+@override_settings(ASYNC_READ_WORKERS=0)
+class AsyncReadParityTest(RecipeTest):
+    """Async read views must answer exactly like the sync ones"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='async_user', email='async_user@mail.com'
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        get_objects_instances_to_test(3)
+        Favorite.objects.create(user=cls.user, recipe=Recipe.objects.first())
+
+    def get_urls(self):
+        recipe = Recipe.objects.first()
+        return (
+            '/api/recipes/',
+            '/api/recipes/?limit=2&page=2',
+            '/api/recipes/?cursor=',
+            '/api/recipes/?is_favorited=1&tags=breakfast',
+            f'/api/recipes/{recipe.id}/',
+            '/api/recipes/0/',
+            '/api/ingredients/',
+            '/api/ingredients/?name=ingr',
+            f'/api/ingredients/{Ingredient.objects.first().id}/',
+            '/api/tags/',
+            f'/api/tags/{Tag.objects.first().id}/',
+        )
+
+    def get_sync(self, url, token=None):
+        cache.clear()
+        if token:
+            return self.client.get(url, HTTP_AUTHORIZATION=f'Token {token}')
+        return self.client.get(url)
+
+    async def request_async(self, method, url, token=None):
+        extra = {'authorization': f'Token {token}'} if token else {}
+        return await getattr(self.async_client, method)(url, **extra)
+
+    def get_async(self, url, token=None):
+        cache.clear()
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            return async_to_sync(self.request_async)('get', url, token)
+
+    def test_read_routes_are_async(self):
+        for url in self.get_urls():
+            with self.subTest(url=url):
+                view = resolve(url.split('?')[0], urlconf=ASYNC_URLCONF).func
+                self.assertTrue(asyncio.iscoroutinefunction(view))
+
+    def test_responses_match_sync_views(self):
+        for url in self.get_urls():
+            for token in (None, self.token.key):
+                with self.subTest(url=url, token=bool(token)):
+                    expected = self.get_sync(url, token)
+                    response = self.get_async(url, token)
+
+                    self.assertEqual(
+                        response.status_code, expected.status_code
+                    )
+                    self.assertEqual(
+                        response['Content-Type'], expected['Content-Type']
+                    )
+                    self.assertEqual(response.content, expected.content)
+
+    def test_writes_still_work(self):
+        url = f'/api/recipes/{Recipe.objects.last().id}/favorite/'
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            response = async_to_sync(self.request_async)(
+                'post', url, self.token.key
+            )
+
+        self.assertEqual(response.status_code, 201)
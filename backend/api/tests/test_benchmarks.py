@@ -0,0 +1,291 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import (
+    AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase,
+    TransactionTestCase, override_settings,
+)
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+
+from api.async_views import get_executor
+from api.filters import MAX_IN_IDS, RecipeFilter
+from api.renderers import ORJSONRenderer
+from api.serializers import IngredientSerializer
+from api.tests.benchmarks import (
+    BENCHMARK_RECIPES, get_budget_violations, get_routes, load_budgets,
+    measure, run_routes, seed_dataset, write_report,
+)
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeTag, ShoppingList,
+)
+
+User = get_user_model()
+CART_SIZES = (10, 100, 1000)
+RENDER_REPEAT = 20
+CONCURRENT_REQUESTS = 16
+ASYNC_WORKERS = (1, 4)
+# the ingredient list is answered from the catalogue cache in both modes
+FAST_LIST_ROUTES = (
+    'recipes_list',
+    'recipes_filter_tags',
+    'subscriptions',
+)
+
+
+class BudgetTest(SimpleTestCase):
+    """Only query budgets are enforced unless timings are asked for"""
+
+    def test_timing_budgets_are_opt_in(self):
+        results = {'route': {'queries': 3, 'time_ms': 90.0, 'peak_kb': 900}}
+        budgets = {'route': {'queries': 2, 'time_ms': 50, 'peak_kb': 500}}
+
+        self.assertEqual(
+            get_budget_violations(results, budgets, enforce_timings=False),
+            ['route: queries 3 > budget 2'],
+        )
+        self.assertEqual(
+            len(get_budget_violations(results, budgets, enforce_timings=True)),
+            3,
+        )
+
+
+class ApiBenchmarkTest(TestCase):
+    """Per-route query count, latency and memory budgets.
+
+    Dataset size, repeats and report path come from the BENCHMARK_RECIPES,
+    BENCHMARK_REPEAT and BENCHMARK_OUTPUT environment variables. Query
+    budgets are always enforced, time and memory ones with
+    BENCHMARK_ENFORCE_TIMINGS=True.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = seed_dataset()
+        cls.token = Token.objects.create(user_id=cls.ids['user_id'])
+
+    def test_routes_within_budget(self):
+        client = Client(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        routes = get_routes(self.ids)
+        results = run_routes(client, routes)
+        write_report(results, recipes=BENCHMARK_RECIPES)
+
+        self.assertLessEqual(
+            set(results),
+            set(load_budgets()),
+            'every benchmarked route needs a budget',
+        )
+        for name, metrics in results.items():
+            self.assertLess(
+                metrics['status'], status.HTTP_400_BAD_REQUEST, name
+            )
+        self.assertEqual(
+            get_budget_violations(results, load_budgets()), []
+        )
+
+    def test_shopping_cart_pdf_within_budget(self):
+        url = '/api/recipes/download_shopping_cart/'
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        results = {}
+        for size in CART_SIZES:
+            user = User.objects.create(
+                username=f'cart_{size}', email=f'cart_{size}@mail.com'
+            )
+            ShoppingList.objects.bulk_create(
+                ShoppingList(user=user, recipe_id=recipe_id)
+                for recipe_id in recipe_ids[:size]
+            )
+            token = Token.objects.create(user=user)
+            client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+            name = f'download_shopping_cart_{size}'
+            results[name] = measure(client, 'get', url, trace=True)
+            results[f'{name}_cached'] = measure(client, 'get', url)
+        write_report(results, 'shopping_cart', recipes=BENCHMARK_RECIPES)
+
+        self.assertEqual(
+            get_budget_violations(results, load_budgets()), []
+        )
+
+    @staticmethod
+    def time_render(renderer, data):
+        timings = []
+        for _ in range(RENDER_REPEAT):
+            start = time.perf_counter()
+            content = renderer.render(data)
+            timings.append((time.perf_counter() - start) * 1000)
+        return content, round(statistics.median(timings), 3)
+
+    def test_renderers_on_real_payloads(self):
+        client = Client(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        payloads = {
+            'ingredients_catalogue': IngredientSerializer(
+                Ingredient.objects.select_related('measurement_unit'),
+                many=True,
+            ).data,
+            'recipes_page': client.get('/api/recipes/?limit=24').data,
+            'subscriptions_page': client.get(
+                '/api/users/subscriptions/?limit=24&recipes_limit=3'
+            ).data,
+        }
+        results = {}
+        for name, data in payloads.items():
+            expected, json_ms = self.time_render(JSONRenderer(), data)
+            content, orjson_ms = self.time_render(ORJSONRenderer(), data)
+            self.assertEqual(content, expected, name)
+            results[name] = {
+                'kb': round(len(content) / 1024, 1),
+                'json_ms': json_ms,
+                'orjson_ms': orjson_ms,
+            }
+        write_report(results, 'renderers', recipes=BENCHMARK_RECIPES)
+
+    def test_fast_list_serializers(self):
+        client = Client(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        routes = [
+            route
+            for route in get_routes(self.ids)
+            if route[0] in FAST_LIST_ROUTES
+        ]
+        results = run_routes(client, routes)
+        with override_settings(FAST_LIST_SERIALIZERS=True):
+            fast_results = run_routes(client, routes)
+        report = {}
+        for name, metrics in results.items():
+            fast = fast_results[name]
+            self.assertEqual(fast['status'], metrics['status'], name)
+            self.assertLessEqual(fast['queries'], metrics['queries'], name)
+            report[name] = {
+                'queries': metrics['queries'],
+                'fast_queries': fast['queries'],
+                'time_ms': metrics['time_ms'],
+                'fast_time_ms': fast['time_ms'],
+            }
+        write_report(report, 'fast_serializers', recipes=BENCHMARK_RECIPES)
+
+
+class FilterIndexTest(TestCase):
+    """Recipe filters must be index lookups on both relation branches.
+
+    The dataset is sized here so the EXISTS branch is reached whatever
+    BENCHMARK_RECIPES is.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        ids = seed_dataset(recipes=MAX_IN_IDS * 2)
+        cls.user = User.objects.get(pk=ids['user_id'])
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe_id=recipe_id)
+            for recipe_id in Recipe.objects.exclude(
+                in_favorite__user=cls.user
+            ).values_list('id', flat=True)[:MAX_IN_IDS]
+        )
+        cls.small_user = User.objects.exclude(pk=cls.user.pk).first()
+
+    def setUp(self):
+        # bulk_create leaves the cached relations of the users stale
+        cache.clear()
+
+    def filter_recipes(self, user):
+        request = RequestFactory().get(
+            '/api/recipes/',
+            {'tags': ['breakfast', 'lunch'], 'is_favorited': '1'},
+        )
+        request.user = user
+        return RecipeFilter(
+            request.GET, Recipe.objects.all(), request=request
+        ).qs
+
+    def assert_uses_index(self, queryset, model):
+        """Every plan line touching the model's table must use an index.
+
+        SQLite names subquery tables by alias, its plan shows the table only
+        in the index name, so a full scan is reported as a missing table.
+        """
+        table = model._meta.db_table
+        lines = [
+            line
+            for line in queryset.explain().splitlines()
+            if table in line
+        ]
+        self.assertTrue(lines, f'{table} is not in the plan')
+        for line in lines:
+            self.assertIn('index', line.lower(), line)
+
+    def test_large_favorites_use_exists(self):
+        self.assertGreater(self.user.favorites.count(), MAX_IN_IDS)
+        queryset = self.filter_recipes(self.user)
+
+        self.assert_uses_index(queryset, RecipeTag)
+        self.assert_uses_index(queryset, Favorite)
+
+    def test_small_favorites_use_id_list(self):
+        self.assertLessEqual(self.small_user.favorites.count(), MAX_IN_IDS)
+        queryset = self.filter_recipes(self.small_user)
+        sql = str(queryset.query)
+
+        self.assertIn(f'"{Recipe._meta.db_table}"."id" IN (', sql)
+        self.assertNotIn(Favorite._meta.db_table, sql)
+        self.assert_uses_index(queryset, RecipeTag)
+
+
+class AsyncConcurrencyBenchmarkTest(TransactionTestCase):
+    """Wall time of concurrent reads through the ASGI handler.
+
+    Sync views share one thread under ASGI, async read views use a pool of
+    ASYNC_READ_WORKERS threads. Worker threads need committed data, so the
+    benchmark needs a database file.
+    """
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('worker threads cannot see an in-memory test DB')
+        self.ids = seed_dataset()
+        self.token = Token.objects.create(user_id=self.ids['user_id'])
+
+    async def gather(self, url):
+        client = AsyncClient()
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *(
+                client.get(url, authorization=f'Token {self.token.key}')
+                for _ in range(CONCURRENT_REQUESTS)
+            )
+        )
+        return responses, round((time.perf_counter() - start) * 1000, 3)
+
+    def run_mode(self, url, urlconf, workers):
+        get_executor.cache_clear()
+        with override_settings(
+            ROOT_URLCONF=urlconf, ASYNC_READ_WORKERS=workers
+        ):
+            responses, elapsed = async_to_sync(self.gather)(url)
+        if workers:
+            get_executor().shutdown(wait=True)
+            get_executor.cache_clear()
+        return responses, {
+            'requests': CONCURRENT_REQUESTS,
+            'workers': workers,
+            'time_ms': elapsed,
+        }
+
+    def test_async_reads_under_concurrency(self):
+        url = '/api/recipes/?limit=24'
+        expected, results = None, {}
+        modes = [('sync_views', 'foodgram.urls', 0)] + [
+            (f'async_views_{workers}', 'api.tests.async_urls', workers)
+            for workers in ASYNC_WORKERS
+        ]
+        for name, urlconf, workers in modes:
+            responses, results[name] = self.run_mode(url, urlconf, workers)
+            expected = expected or responses[0].content
+            for response in responses:
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.content, expected, name)
+        write_report(results, 'async', recipes=BENCHMARK_RECIPES)
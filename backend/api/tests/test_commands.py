@@ -0,0 +1,352 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from api.tests.fixtures import TEMP_MEDIA_ROOT
+from recipes.management.commands.import_csv import CsvStream, iter_json_items
+from recipes.models import (
+    Favorite, Ingredient, Recipe, ShoppingCartExport, ShoppingList, Unit,
+)
+from users.models import Follow
+
+User = get_user_model()
+
+INGREDIENTS = (
+    ('абрикосовое варенье', 'г'),
+    ('абрикосовый сок', 'стакан'),
+    ('соль', 'г'),
+)
+
+
+class ImportCsvTest(TestCase):
+    """import_csv command tests"""
+
+    def import_file(self, suffix, content):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix=suffix, encoding='utf-8'
+        ) as source:
+            source.write(content)
+            source.flush()
+            out = io.StringIO()
+            call_command('import_csv', path=source.name, stdout=out)
+        return out.getvalue()
+
+    def test_json_is_read_by_chunks(self):
+        items = [
+            {'name': name, 'measurement_unit': unit, 'weight': num * 1.5}
+            for num, (name, unit) in enumerate(INGREDIENTS)
+        ]
+        content = ' \n[ ' + ' ,\n'.join(json.dumps(item) for item in items)
+        for chunk_size in (1, 2, 7, 1024):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(
+                    list(
+                        iter_json_items(io.StringIO(content + ']'), chunk_size)
+                    ),
+                    items,
+                )
+                with self.assertRaises(ValueError):
+                    list(iter_json_items(io.StringIO(content), chunk_size))
+
+    def test_copy_stream_renders_rows_by_batches(self):
+        expected = io.StringIO()
+        csv.writer(expected).writerows(INGREDIENTS * 3)
+        for size in (1, 5, 64, -1):
+            with self.subTest(size=size):
+                stream = CsvStream(INGREDIENTS * 3, batch_size=2)
+                content = ''.join(iter(lambda: stream.read(size), ''))
+                self.assertEqual(content, expected.getvalue())
+                self.assertEqual(stream.count, len(INGREDIENTS) * 3)
+
+    def test_reimport_skips_existing_ingredients(self):
+        csv_content = ''.join(f'{name},{unit}\n' for name, unit in INGREDIENTS)
+        json_content = json.dumps(
+            [
+                {'name': name, 'measurement_unit': unit}
+                for name, unit in INGREDIENTS + (('перец', 'г'),)
+            ]
+        )
+
+        first_output = self.import_file('.csv', csv_content)
+        second_output = self.import_file('.json', json_content)
+
+        self.assertIn('3 Ingredient Objects Created, 0 skipped', first_output)
+        self.assertIn('1 Ingredient Objects Created, 3 skipped', second_output)
+        self.assertEqual(Ingredient.objects.count(), len(INGREDIENTS) + 1)
+        self.assertEqual(Unit.objects.count(), 2)
+
+
+class CountersTest(TestCase):
+    """Denormalized counters and repair_counters command tests"""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create(
+                username=f'counter_user_{num}',
+                email=f'counter_user_{num}@mail.com',
+            )
+            for num in range(3)
+        ]
+        self.author = self.users[0]
+        self.recipe = Recipe.objects.create(
+            name='Рецепт',
+            text='Описание',
+            cooking_time=1,
+            image='recipes/images/counter.gif',
+            author=self.author,
+        )
+
+    def assert_counters(self, favorites, in_carts, recipes, followers):
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(
+            (
+                self.recipe.favorites_count,
+                self.recipe.in_carts_count,
+                self.author.recipes_count,
+                self.author.followers_count,
+            ),
+            (favorites, in_carts, recipes, followers),
+        )
+
+    def test_counters_follow_rows(self):
+        Favorite.objects.create(user=self.users[1], recipe=self.recipe)
+        Favorite.objects.bulk_create(
+            [Favorite(user=self.users[2], recipe=self.recipe)]
+        )
+        ShoppingList.objects.bulk_create(
+            [
+                ShoppingList(user=user, recipe=self.recipe)
+                for user in self.users
+            ]
+        )
+        ShoppingList.objects.bulk_create(
+            [ShoppingList(user=self.users[1], recipe=self.recipe)],
+            ignore_conflicts=True,
+        )
+        Follow.objects.create(user=self.users[1], author=self.author)
+        Follow.objects.create(user=self.users[2], author=self.author)
+        self.assert_counters(2, 3, 1, 2)
+
+        Favorite.objects.filter(user=self.users[1]).delete()
+        self.users[2].delete()
+        self.assert_counters(0, 2, 1, 1)
+
+    def test_repair_counters(self):
+        Favorite.objects.create(user=self.users[1], recipe=self.recipe)
+        Recipe.objects.update(favorites_count=5, in_carts_count=2)
+        User.objects.filter(pk=self.author.pk).update(followers_count=1)
+        out = io.StringIO()
+
+        call_command('repair_counters', stdout=out)
+
+        self.assertIn('Recipe.favorites_count: 1 fixed', out.getvalue())
+        self.assertIn('User.followers_count: 1 fixed', out.getvalue())
+        self.assert_counters(1, 0, 1, 0)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_RENDITION_WORKERS=0)
+class CreateRenditionsTest(TestCase):
+    """create_renditions command tests"""
+
+    def test_renditions_fit_size_caps(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (2000, 1000), (200, 80, 40, 255)).save(
+            buffer, 'PNG'
+        )
+        recipe = Recipe(
+            name='Рецепт',
+            text='Описание',
+            cooking_time=1,
+            author=User.objects.create(
+                username='image_user', email='image_user@mail.com'
+            ),
+        )
+        recipe.image.save('large.png', ContentFile(buffer.getvalue()))
+        out = io.StringIO()
+
+        call_command('create_renditions', stdout=out)
+        call_command('create_renditions', stdout=out)
+
+        recipe.refresh_from_db()
+        self.assertIn('1 recipes rendered, 0 failed', out.getvalue())
+        self.assertIn('0 recipes rendered, 0 failed', out.getvalue())
+        for name, size in settings.IMAGE_RENDITIONS.items():
+            with recipe.image.storage.open(
+                recipe.image_renditions[name]
+            ) as rendition_file, Image.open(rendition_file) as rendition:
+                self.assertEqual(
+                    rendition.size, (size[0], size[0] // 2), name
+                )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_RENDITION_WORKERS=0)
+class CleanupMediaTest(TestCase):
+    """Content addressed storage and cleanup_media command tests"""
+
+    def setUp(self):
+        self.storage = Recipe._meta.get_field('image').storage
+        self.user = User.objects.create(
+            username='media_user', email='media_user@mail.com'
+        )
+
+    def create_recipe(self, content, name='Рецепт'):
+        recipe = Recipe(
+            name=name, text='Описание', cooking_time=1, author=self.user
+        )
+        recipe.image.save('photo.gif', ContentFile(content))
+        return recipe
+
+    def save_orphan(self, content, age):
+        name = self.storage.save(
+            'recipes/images/old.gif', ContentFile(content)
+        )
+        self.age(name, age)
+        return name
+
+    def age(self, name, age=7200):
+        stamp = time.time() - age
+        os.utime(self.storage.path(name), (stamp, stamp))
+
+    @override_settings(MEDIA_MIN_AGE=0)
+    def test_identical_images_share_one_file(self):
+        first = self.create_recipe(b'same image')
+        second = self.create_recipe(b'same image', name='Копия')
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            first.image.name,
+            'recipes/images/{0}/{1}.gif'.format(
+                first.image.name.split('/')[-1][:2],
+                hashlib.sha256(b'same image').hexdigest(),
+            ),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(self.storage.exists(second.image.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(self.storage.exists(second.image.name))
+
+    def test_reused_file_is_kept_for_a_recipe_being_saved(self):
+        first = self.create_recipe(b'shared image')
+        self.age(first.image.name)
+        # another recipe uploads the same image and is not committed yet
+        reused = self.storage.save(
+            'recipes/images/photo.gif', ContentFile(b'shared image')
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        self.assertEqual(reused, first.image.name)
+        self.assertTrue(self.storage.exists(reused))
+
+    def test_replaced_image_is_released(self):
+        recipe = self.create_recipe(b'first image')
+        old = recipe.image.name
+        self.age(old)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.image.save('photo.gif', ContentFile(b'second image'))
+
+        self.assertFalse(self.storage.exists(old))
+        self.assertTrue(self.storage.exists(recipe.image.name))
+
+    def test_cleanup_deletes_old_orphans_only(self):
+        used = self.create_recipe(b'used image').image.name
+        orphan = self.save_orphan(b'orphan image', age=7200)
+        fresh = self.storage.save(
+            'recipes/images/new.gif', ContentFile(b'fresh image')
+        )
+        out = io.StringIO()
+
+        call_command('cleanup_media', '--dry-run', stdout=out)
+        self.assertIn(orphan, out.getvalue())
+        self.assertIn('1 orphans would be deleted', out.getvalue())
+        self.assertTrue(self.storage.exists(orphan))
+
+        call_command('cleanup_media', '--batch-size', '1', stdout=out)
+        self.assertIn('1 orphans deleted', out.getvalue())
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(used))
+        self.assertTrue(self.storage.exists(fresh))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, SHOPPING_CART_EXPORT_WORKERS=0)
+class ProcessExportsTest(TestCase):
+    """process_exports command tests"""
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='export_user', email='export_user@mail.com'
+        )
+
+    def create_export(self, age=0, **fields):
+        export = ShoppingCartExport.objects.create(user=self.user, **fields)
+        moment = timezone.now() - timedelta(seconds=age)
+        ShoppingCartExport.objects.filter(pk=export.pk).update(
+            created=moment, claimed=moment if fields.get('status') else None
+        )
+        return export
+
+    def test_stuck_exports_requeued_or_failed(self):
+        timeout = settings.SHOPPING_CART_EXPORT_TIMEOUT
+        stuck = self.create_export(
+            age=timeout + 1, status=ShoppingCartExport.RUNNING, attempts=1
+        )
+        exhausted = self.create_export(
+            age=timeout + 1,
+            status=ShoppingCartExport.RUNNING,
+            attempts=settings.SHOPPING_CART_EXPORT_ATTEMPTS,
+        )
+        running = self.create_export(
+            status=ShoppingCartExport.RUNNING, attempts=1
+        )
+        out = io.StringIO()
+
+        call_command('process_exports', '--once', stdout=out)
+
+        self.assertIn('1 stuck exports requeued, 1 failed', out.getvalue())
+        stuck.refresh_from_db()
+        exhausted.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(stuck.status, ShoppingCartExport.DONE)
+        self.assertEqual(stuck.attempts, 2)
+        self.assertEqual(exhausted.status, ShoppingCartExport.FAILED)
+        self.assertEqual(running.status, ShoppingCartExport.RUNNING)
+
+    def test_expired_exports_deleted_with_files(self):
+        expired = self.create_export(
+            age=settings.SHOPPING_CART_EXPORT_TTL + 1,
+            status=ShoppingCartExport.DONE,
+            file=ContentFile(b'%PDF', name='old.pdf'),
+        )
+        path = expired.file.path
+        fresh = self.create_export(status=ShoppingCartExport.DONE)
+        out = io.StringIO()
+
+        call_command('process_exports', '--once', stdout=out)
+
+        self.assertIn('1 expired exports deleted', out.getvalue())
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(
+            ShoppingCartExport.objects.filter(pk=expired.pk).exists()
+        )
+        self.assertTrue(
+            ShoppingCartExport.objects.filter(pk=fresh.pk).exists()
+        )
@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.tests.benchmarks import seed_dataset
+from recipes.models import Recipe
+from recipes.renditions import SOURCE_KEY
+from users.authentication import token_cache
+
+GOLDEN_RECIPES = 60
+
+
+class FastListSerializersTest(TestCase):
+    """Values based lists must answer exactly like the DRF serializers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = seed_dataset(recipes=GOLDEN_RECIPES)
+        cls.token = Token.objects.create(user_id=cls.ids['user_id'])
+        recipe = Recipe.objects.first()
+        recipe.image_renditions = {
+            SOURCE_KEY: recipe.image.name,
+            'thumbnail': 'recipes/renditions/thumbnail.webp',
+        }
+        recipe.save(update_fields=('image_renditions',))
+
+    def get_urls(self):
+        return (
+            '/api/recipes/',
+            '/api/recipes/?limit=24&page=2',
+            '/api/recipes/?limit=5&cursor=',
+            '/api/recipes/?limit=24&tags=breakfast&tags=lunch',
+            f'/api/recipes/?author={self.ids["author_id"]}',
+            '/api/recipes/?limit=24&is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=0',
+            '/api/ingredients/',
+            '/api/users/subscriptions/',
+            '/api/users/subscriptions/?limit=24&recipes_limit=3',
+            '/api/users/subscriptions/?limit=5&cursor=',
+        )
+
+    def get(self, url, fast, token=None):
+        cache.clear()
+        token_cache.clear()
+        client = Client(HTTP_AUTHORIZATION=f'Token {token}') if token else (
+            Client()
+        )
+        with override_settings(FAST_LIST_SERIALIZERS=fast):
+            return client.get(url)
+
+    def assert_same(self, url, token=None):
+        expected = self.get(url, False, token)
+        response = self.get(url, True, token)
+        self.assertEqual(response.status_code, expected.status_code, url)
+        self.assertEqual(response.json(), expected.json(), url)
+        return response.json()
+
+    def test_lists_match_serializers(self):
+        for url in self.get_urls():
+            with self.subTest(url=url):
+                self.assert_same(url, self.token.key)
+
+    def test_anonymous_lists_match_serializers(self):
+        for url in ('/api/recipes/', '/api/recipes/?is_favorited=1'):
+            with self.subTest(url=url):
+                self.assert_same(url)
+
+    def test_keyset_pages_match_serializers(self):
+        for url in (
+            '/api/recipes/?limit=24&cursor=',
+            '/api/users/subscriptions/?limit=7&cursor=',
+        ):
+            pages = 0
+            while url:
+                url = self.assert_same(url, self.token.key)['next']
+                pages += 1
+            self.assertGreater(pages, 1)
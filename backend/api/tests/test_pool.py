@@ -0,0 +1,146 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+from django.db import connections
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from foodgram.db import pool
+from users.models import User
+
+POOL_DIR = tempfile.mkdtemp()
+
+
+def connect():
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """Connection pool tests"""
+
+    def setUp(self):
+        self.stats = pool.ConnectionStats()
+
+    def test_connections_are_reused(self):
+        connection_pool = pool.ConnectionPool(2, 1, self.stats)
+        first = connection_pool.acquire(connect)
+        connection_pool.release(first)
+        second = connection_pool.acquire(connect)
+
+        self.assertIs(first, second)
+        self.assertEqual(self.stats.get(), {'checkouts': 2, 'connections': 1})
+
+    def test_broken_connection_is_replaced(self):
+        connection_pool = pool.ConnectionPool(1, 1, self.stats)
+        broken = connection_pool.acquire(connect)
+        broken.close()
+        connection_pool.release(broken)
+        replaced = connection_pool.acquire(connect)
+
+        self.assertIsNot(replaced, broken)
+        self.assertEqual(self.stats.get()['broken'], 1)
+        self.assertEqual(connection_pool.size, 1)
+
+    def test_checkout_waits_for_a_free_connection(self):
+        connection_pool = pool.ConnectionPool(1, 0.05, self.stats)
+        connection = connection_pool.acquire(connect)
+        with self.assertRaises(pool.PoolTimeout):
+            connection_pool.acquire(connect)
+
+        connection_pool.timeout = 5
+        timer = threading.Timer(0.05, connection_pool.release, [connection])
+        timer.start()
+        waited = connection_pool.acquire(connect)
+        timer.join()
+
+        self.assertIs(waited, connection)
+        self.assertEqual(self.stats.get()['timeouts'], 1)
+        self.assertEqual(self.stats.get()['waits'], 1)
+        self.assertGreater(self.stats.get()['wait_time_ms'], 0)
+
+
+class PooledBackendTest(SimpleTestCase):
+    """Health checks and pooling of the foodgram.db backends"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connections.databases['pooled'] = {
+            **connections['default'].settings_dict,
+            'ENGINE': 'foodgram.db.sqlite3',
+            'NAME': os.path.join(POOL_DIR, 'pooled.sqlite3'),
+            'CONN_MAX_AGE': 60,
+            'TEST': {},
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['pooled'].close()
+        del connections.databases['pooled']
+        delattr(connections._connections, 'pooled')
+        shutil.rmtree(POOL_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        pool._pools.pop('pooled', None)
+        pool._stats.pop('pooled', None)
+
+    def query(self):
+        with connections['pooled'].cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    @override_settings(DATABASE_POOL_MODE='persistent')
+    def test_dead_persistent_connection_is_reopened(self):
+        self.query()
+        connections['pooled'].connection.close()
+        connections['pooled'].close_if_unusable_or_obsolete()
+        self.query()
+
+        self.assertEqual(
+            pool.get_all_stats()['pooled'], {'connections': 2, 'broken': 1}
+        )
+        connections['pooled'].close()
+
+    @override_settings(DATABASE_POOL_MODE='pool')
+    def test_threads_share_pooled_connections(self):
+        def request():
+            self.query()
+            connections['pooled'].close()
+
+        for _ in range(3):
+            thread = threading.Thread(target=request)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(
+            pool.get_all_stats()['pooled'],
+            {'checkouts': 3, 'connections': 1, 'size': 1, 'idle': 1},
+        )
+
+
+class StatsViewTest(TestCase):
+    """Runtime stats endpoint tests"""
+
+    def test_stats_are_for_staff_only(self):
+        admin = User.objects.create(
+            username='admin', email='admin@mail.com', is_staff=True
+        )
+        user = User.objects.create(username='user', email='user@mail.com')
+        responses = [
+            Client(
+                HTTP_AUTHORIZATION='Token {}'.format(
+                    Token.objects.create(user=person)
+                )
+            ).get('/api/stats/')
+            for person in (admin, user)
+        ]
+
+        self.assertEqual(responses[0].status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(responses[0].json()), {'token_cache', 'databases'}
+        )
+        self.assertEqual(responses[1].status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,126 @@
+import datetime
+import io
+import uuid
+
+from collections import OrderedDict
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import MessagePackParser, ORJSONParser
+from api.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+from api.tests.fixtures import RecipeTest, get_objects_instances_to_test
+from users.models import User
+
+PAYLOADS = {
+    'unicode': {'name': 'Борщ 🍲', 'text': 'строка и абзац'},
+    'numbers': [0, -1, 2 ** 63 - 1, 1.5, 0.1 + 0.2, 1e15, True, None],
+    'decimal': {'amount': Decimal('1.10')},
+    'datetime': {
+        'pub_date': datetime.datetime(
+            2021, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc
+        ),
+        'date': datetime.date(2021, 5, 1),
+        'time': datetime.time(12, 30),
+        'duration': datetime.timedelta(minutes=90),
+    },
+    'uuid': {'id': uuid.UUID('12345678-1234-5678-1234-567812345678')},
+    'lazy': {'detail': gettext_lazy('Invalid token.')},
+    'keys': {1: 'one', 'nested': OrderedDict(((2, 'two'), ('b', ('a',))))},
+    'huge': {'value': 2 ** 70},
+}
+
+
+class ORJSONRendererTest(SimpleTestCase):
+    """orjson renderer and parser must match DRF's json ones"""
+
+    def test_output_matches_json_renderer(self):
+        for name, data in PAYLOADS.items():
+            with self.subTest(payload=name):
+                self.assertEqual(
+                    ORJSONRenderer().render(data),
+                    JSONRenderer().render(data),
+                )
+
+    def test_indent_falls_back_to_json_renderer(self):
+        media_type = 'application/json; indent=2'
+        self.assertEqual(
+            ORJSONRenderer().render(PAYLOADS['unicode'], media_type),
+            JSONRenderer().render(PAYLOADS['unicode'], media_type),
+        )
+
+    def test_non_finite_floats_fall_back_to_json_renderer(self):
+        data = {'values': [1.5, None, (float('inf'),)]}
+        with self.assertRaises(ValueError):
+            JSONRenderer().render(data)
+        with self.assertRaises(ValueError):
+            ORJSONRenderer().render(data)
+
+        renderer, json_renderer = ORJSONRenderer(), JSONRenderer()
+        renderer.strict = json_renderer.strict = False
+        for value in (float('nan'), float('-inf'), Decimal('NaN')):
+            with self.subTest(value=value):
+                data = {'value': value, 'other': None}
+                self.assertEqual(
+                    renderer.render(data), json_renderer.render(data)
+                )
+
+    def test_parser_matches_json_parser(self):
+        content = JSONRenderer().render(PAYLOADS['unicode'])
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO(content)),
+            JSONParser().parse(io.BytesIO(content)),
+        )
+        for invalid in (b'{"a": NaN}', b'{', b''):
+            with self.subTest(content=invalid):
+                with self.assertRaises(ParseError):
+                    ORJSONParser().parse(io.BytesIO(invalid))
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_messagepack_round_trip(self):
+        content = MessagePackRenderer().render(PAYLOADS['unicode'])
+        self.assertEqual(
+            MessagePackParser().parse(io.BytesIO(content)),
+            PAYLOADS['unicode'],
+        )
+
+
+class ApiRenderingTest(RecipeTest):
+    """Real API payloads rendered with orjson"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='render_user', email='render_user@mail.com'
+        )
+        get_objects_instances_to_test(3)
+
+    def setUp(self):
+        self.get_client()
+
+    def test_api_responses_match_json_renderer(self):
+        for url in ('/api/recipes/', '/api/users/', '/api/users/me/'):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertEqual(
+                    response.content, JSONRenderer().render(response.data)
+                )
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_messagepack_negotiation(self):
+        response = self.client.get(
+            '/api/recipes/', HTTP_ACCEPT='application/msgpack'
+        )
+
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(
+            msgpack.unpackb(response.content, raw=False),
+            self.client.get('/api/recipes/').json(),
+        )
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from foodgram import replicas
+from recipes.models import Tag
+
+REPLICA_DIR = tempfile.mkdtemp()
+
+
+def read_tags(request):
+    if request.method == 'POST':
+        Tag.objects.create(name='Новый', color='#000000', slug='new')
+    return HttpResponse(','.join(Tag.objects.values_list('name', flat=True)))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TestCase):
+    """Read replica router and middleware tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # a separate SQLite file stands in for a replica that lags behind
+        for alias, name in (
+            ('replica', os.path.join(REPLICA_DIR, 'replica.sqlite3')),
+            ('broken', os.path.join(REPLICA_DIR, 'missing', 'db.sqlite3')),
+        ):
+            connections.databases[alias] = {
+                **connections['default'].settings_dict,
+                'NAME': name,
+                'TEST': {},
+            }
+        with connections['replica'].schema_editor() as editor:
+            editor.create_model(Tag)
+        Tag.objects.using('replica').create(
+            name='Реплика', color='#FFFFFF', slug='replica'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in ('replica', 'broken'):
+            connections[alias].close()
+            del connections.databases[alias]
+            delattr(connections._connections, alias)
+        shutil.rmtree(REPLICA_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        Tag.objects.create(name='Основная', color='#E26C2D', slug='primary')
+        replicas._down_until.clear()
+        self.factory = RequestFactory()
+        self.middleware = replicas.ReplicaMiddleware(read_tags)
+
+    def test_safe_requests_read_from_replica(self):
+        response = self.middleware(self.factory.get('/'))
+
+        self.assertEqual(response.content.decode(), 'Реплика')
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_write_pins_reads_to_primary(self):
+        written = self.middleware(self.factory.post('/'))
+        request = self.factory.get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = '1'
+        pinned = self.middleware(request)
+
+        self.assertEqual(written.content.decode(), 'Новый,Основная')
+        self.assertIn(replicas.PIN_COOKIE, written.cookies)
+        self.assertEqual(pinned.content.decode(), 'Новый,Основная')
+
+    @override_settings(DATABASE_REPLICAS=['broken'])
+    def test_unreachable_replica_falls_back_to_primary(self):
+        response = self.middleware(self.factory.get('/'))
+
+        self.assertEqual(response.content.decode(), 'Основная')
+        self.assertTrue(replicas.is_down('broken'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        response = self.middleware(self.factory.get('/'))
+
+        self.assertEqual(response.content.decode(), 'Основная')
@@ -1,16 +1,40 @@
+import os
+import threading
+import time
+
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import memcache_key_warnings
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 
+from api.exports import process_pending_exports
 from api.serializers import (
     IngredientSerializer, RecipeIngredientsSerializer, RecipeSerializer,
     TagSerializer,
 )
-from api.tests.fixtures import RecipeTest, get_objects_instances_to_test
-from recipes.models import Ingredient, Recipe, Tag
+from api.tests.fixtures import (
+    TEMP_MEDIA_ROOT, RecipeTest, get_objects_instances_to_test,
+)
+from api.utils import create_pdf_from_queryset
+from recipes import search_index
+from recipes.models import (
+    CacheVersion, Ingredient, Recipe, RecipeIngredient, ShoppingCartExport,
+    ShoppingList, Tag, Unit,
+)
+from recipes.renditions import create_renditions
+from recipes.versions import CATALOGUE_VERSION_KEY, bump_catalogue_version
+from users.authentication import token_cache
 from users.models import Follow, User
 from users.serializers import SubscriptionSerializer
 
 RECIPE_TO_TEST = 2
+CONCURRENT_REQUESTS = 8
 
 
 class PostURLTests(RecipeTest):
@@ -94,6 +118,12 @@ class PostURLTests(RecipeTest):
     def test_anonymous_get_recipe_list_url(self):
         self.recipe_test(self.client, None, '/api/recipes/', True)
 
+    def test_recipe_counters_are_not_public(self):
+        recipe = self.client.get('/api/recipes/').json()['results'][0]
+
+        self.assertNotIn('favorites_count', recipe)
+        self.assertNotIn('in_carts_count', recipe)
+
     def test_get_recipe__url(self):
         self.recipe_test(
             self.authorized_client,
@@ -131,6 +161,387 @@ class PostURLTests(RecipeTest):
     def test_anonymous_get_ingredient_url(self):
         self.ingredient_test(self.client, '/api/ingredients/1/')
 
+    def test_recipe_cursor_pagination(self):
+        self.create_extra_recipes(RECIPE_TO_TEST * 3)
+        expected = [
+            item['id']
+            for item in self.client.get('/api/recipes/?limit=24').json()[
+                'results'
+            ]
+        ]
+        found = []
+        url = '/api/recipes/?limit=2&cursor='
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                data = self.client.get(url).json()
+            found += [item['id'] for item in data['results']]
+            url = data['next']
+            self.assertNotIn('count', data)
+            self.assertFalse(
+                any('COUNT(' in query['sql'] for query in context)
+            )
+
+        self.assertEqual(found, expected)
+        self.assertEqual(
+            self.client.get('/api/recipes/?cursor=bad').status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+    def test_ingredient_search_prefix_matches_first(self):
+        unit = Ingredient.objects.first().measurement_unit
+        for name in ('фасоль', 'соль', 'морская соль', 'сахар'):
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+
+        response = self.client.get('/api/ingredients/?name=Сол')
+        limited = self.client.get('/api/ingredients/?name=сол&limit=2')
+
+        self.assertEqual(
+            [item['name'] for item in response.json()],
+            ['соль', 'морская соль', 'фасоль'],
+        )
+        self.assertEqual(
+            [item['name'] for item in limited.json()], ['соль', 'морская соль']
+        )
+
+    def test_ingredient_search_index_matches_sql(self):
+        unit = Ingredient.objects.first().measurement_unit
+        other_unit = Unit.objects.create(name='кг')
+        # locale collations ignore spaces and sort ё next to е
+        for name in (
+            'фасоль',
+            'соль',
+            'морская соль',
+            'сахар',
+            'соль морская',
+            'сольник',
+            'солёные огурцы',
+            'солянка',
+            'Соль',
+        ):
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+        Ingredient.objects.create(name='соль', measurement_unit=other_unit)
+        urls = [
+            f'/api/ingredients/?name={name}&limit={limit}'
+            for name in ('сол', 'с', 'ingredient', 'redient1', 'нет')
+            for limit in (1, 3, 50)
+        ]
+        sql_responses = [self.client.get(url).json() for url in urls]
+        path = os.path.join(TEMP_MEDIA_ROOT, 'ingredients.idx')
+        search_index.build_snapshot(path)
+
+        with override_settings(INGREDIENT_INDEX_PATH=path):
+            with CaptureQueriesContext(connection) as context:
+                index_responses = [self.client.get(url).json() for url in urls]
+
+        self.assertEqual(index_responses, sql_responses)
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_stale_ingredient_index_falls_back_to_sql(self):
+        path = os.path.join(TEMP_MEDIA_ROOT, 'ingredients.idx')
+        search_index.build_snapshot(path)
+        # a change committed after the snapshot read the rows
+        bump_catalogue_version()
+
+        with override_settings(INGREDIENT_INDEX_PATH=path):
+            with mock.patch.object(search_index, 'schedule_build') as build:
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get('/api/ingredients/?name=ingr')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(context.captured_queries)
+        build.assert_called_once()
+
+    def test_ingredient_index_rebuilt_when_changed_while_building(self):
+        builds = []
+
+        def build_snapshot():
+            builds.append(search_index._building)
+            if len(builds) == 1:
+                search_index.schedule_build()
+
+        with mock.patch.object(
+            search_index, 'build_snapshot', build_snapshot
+        ), mock.patch.object(
+            search_index.threading, 'Thread'
+        ) as thread, mock.patch.object(search_index, 'connection'):
+            search_index.schedule_build()
+            search_index._build()
+
+        self.assertEqual(builds, [True, True])
+        thread.assert_called_once()
+        self.assertFalse(search_index._building)
+
+    def test_catalogue_conditional_get(self):
+        for url in ('/api/tags/', '/api/ingredients/', '/api/tags/1/'):
+            response = self.client.get(url)
+            etag = response['ETag']
+            with CaptureQueriesContext(connection) as context:
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                cached = self.client.get(url)
+
+            self.assertEqual(
+                not_modified.status_code, status.HTTP_304_NOT_MODIFIED
+            )
+            self.assertEqual(cached.json(), response.json())
+            self.assertEqual(cached['ETag'], etag)
+            self.assertIn('public', response['Cache-Control'])
+            self.assertEqual(len(context.captured_queries), 0)
+
+    def test_catalogue_cache_keys(self):
+        keys = []
+        cache_set = cache.set
+
+        def spy(key, *args, **kwargs):
+            keys.append(key)
+            return cache_set(key, *args, **kwargs)
+
+        with mock.patch.object(cache, 'set', spy):
+            first = self.client.get(
+                '/api/tags/', HTTP_ACCEPT='application/json; indent=2'
+            )
+            second = self.client.get(
+                f'/api/tags/?utm={"x" * 300}',
+                HTTP_ACCEPT='application/json; indent=2',
+            )
+
+        self.assertEqual(first['ETag'], second['ETag'])
+        catalogue_keys = [key for key in keys if key.startswith('catalogue')]
+        self.assertEqual(len(catalogue_keys), 1)
+        # memcached rejects keys with spaces or longer than 250 characters
+        self.assertEqual(list(memcache_key_warnings(catalogue_keys[0])), [])
+
+    def test_catalogue_change_updates_etag(self):
+        response = self.client.get('/api/tags/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Перекус', color='#E26C2D', slug='snack')
+
+        changed = self.client.get(
+            '/api/tags/', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertEqual(len(changed.json()), len(response.json()) + 1)
+
+    def get_tags_later(self, seconds, etag):
+        with mock.patch(
+            'django.core.cache.backends.locmem.time.time',
+            return_value=time.time() + seconds,
+        ):
+            return self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+
+    def test_catalogue_version_survives_expiry(self):
+        """Expired stamps are read again, a missed bump shows up in time"""
+        timeout = settings.CACHE_VERSION_TIMEOUT
+        etag = self.client.get('/api/tags/')['ETag']
+        unchanged = self.get_tags_later(timeout + 1, etag)
+        # a bump made by another worker with its own local cache
+        CacheVersion.objects.filter(key=CATALOGUE_VERSION_KEY).update(
+            value='another'
+        )
+        missed = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        changed = self.get_tags_later(2 * timeout + 2, etag)
+
+        self.assertEqual(unchanged.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(missed.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_relations_cached_until_toggled(self):
+        recipe = Recipe.objects.first()
+        url = f'/api/recipes/{recipe.id}/'
+        auth = {'HTTP_AUTHORIZATION': 'Token {}'.format(self.token)}
+        first = self.client.get(url, **auth)
+        with CaptureQueriesContext(connection) as context:
+            cached = self.client.get(url, **auth)
+        cached_queries = len(context.captured_queries)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{url}favorite/', **auth)
+        changed = self.client.get(url, **auth)
+        anonymous = self.client.get(url)
+
+        self.assertFalse(first.json()['is_favorited'])
+        self.assertEqual(cached.json(), first.json())
+        self.assertEqual(cached_queries, self.list_queries_count(url))
+        self.assertTrue(changed.json()['is_favorited'])
+        self.assertFalse(anonymous.json()['is_favorited'])
+
+    def test_token_cache_invalidation(self):
+        url = '/api/users/me/'
+        auth = {'HTTP_AUTHORIZATION': 'Token {}'.format(self.token)}
+        self.client.get(url, **auth)
+        with CaptureQueriesContext(connection) as context:
+            cached = self.client.get(url, **auth)
+        cached_queries = len(context.captured_queries)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Renamed'
+            self.user.save()
+        renamed = self.client.get(url, **auth)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/token/logout/', **auth)
+        logged_out = self.client.get(url, **auth)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_queries, 0)
+        self.assertEqual(renamed.json()['first_name'], 'Renamed')
+        self.assertEqual(logged_out.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            token_cache.get_stats(),
+            {'size': 0, 'hits': 2, 'shared_hits': 0, 'misses': 3},
+        )
+
+    def test_cached_user_does_not_save_stale_counters(self):
+        auth = {'HTTP_AUTHORIZATION': 'Token {}'.format(self.token)}
+        self.user.set_password('Old-pass1!')
+        self.user.save()
+        self.client.get('/api/users/me/', **auth)
+        recipes_count = User.objects.get(pk=self.user.pk).recipes_count
+        Recipe.objects.create(
+            author=self.user,
+            name='Новый рецепт',
+            text='Описание',
+            cooking_time=1,
+            image='recipes/images/new.gif',
+        )
+
+        response = self.client.post(
+            '/api/users/set_password/',
+            {'current_password': 'Old-pass1!', 'new_password': 'N3w-pass!'},
+            **auth,
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.recipes_count, recipes_count + 1)
+        self.assertTrue(user.check_password('N3w-pass!'))
+        self.assertNotIn('password', token_cache.get(self.token.key))
+
+    def test_bulk_shopping_cart(self):
+        url = '/api/recipes/shopping_cart/'
+        auth = {'HTTP_AUTHORIZATION': 'Token {}'.format(self.token)}
+        first, second = Recipe.objects.values_list('id', flat=True)[:2]
+        missing = Recipe.objects.order_by('-id').first().id + 1
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added = self.client.post(
+                url,
+                {'recipes': [first, first, missing]},
+                content_type='application/json',
+                **auth,
+            )
+        with CaptureQueriesContext(connection) as context:
+            again = self.client.post(
+                url,
+                {'recipes': [first, second]},
+                content_type='application/json',
+                **auth,
+            )
+        queries = len(context.captured_queries)
+        removed = self.client.delete(
+            url,
+            {'recipes': [first, second, missing]},
+            content_type='application/json',
+            **auth,
+        )
+        invalid = self.client.post(
+            url, {'recipes': []}, content_type='application/json', **auth
+        )
+
+        self.assertEqual(
+            added.json(),
+            [
+                {'id': first, 'status': 'added'},
+                {'id': missing, 'status': 'not_found'},
+            ],
+        )
+        self.assertEqual(
+            [item['status'] for item in again.json()],
+            ['already_added', 'added'],
+        )
+        # validation, insert, counters, the token is cached by now
+        self.assertEqual(queries, 3)
+        self.assertEqual(
+            [item['status'] for item in removed.json()],
+            ['removed', 'removed', 'not_found'],
+        )
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ShoppingList.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            Recipe.objects.filter(in_carts_count__gt=0).count(), 0
+        )
+
+    def test_download_shopping_cart_cached_until_cart_changes(self):
+        url = '/api/recipes/download_shopping_cart/'
+        auth = {'HTTP_AUTHORIZATION': 'Token {}'.format(self.token)}
+        recipe = Recipe.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            ShoppingList.objects.create(user=self.user, recipe=recipe)
+
+        response = self.client.get(url, **auth)
+        pdf = b''.join(response.streaming_content)
+        not_modified = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'], **auth
+        )
+        cached = self.client.get(url, **auth)
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.filter(recipe=recipe).update(amount=1)
+            recipe.save()
+        changed = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'], **auth
+        )
+
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(
+            not_modified.status_code, status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(b''.join(cached.streaming_content), pdf)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    @override_settings(
+        SHOPPING_CART_EXPORT_WORKERS=0, SHOPPING_CART_ASYNC_THRESHOLD=1
+    )
+    def test_shopping_cart_background_export(self):
+        auth = {'HTTP_AUTHORIZATION': 'Token {}'.format(self.token)}
+        ShoppingList.objects.create(
+            user=self.user, recipe=Recipe.objects.first()
+        )
+
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', **auth
+        )
+        status_url = (
+            f'/api/recipes/shopping_cart_exports/{response.json()["id"]}/'
+        )
+        pending = self.client.get(status_url, **auth).json()
+        process_pending_exports()
+        done = self.client.get(status_url, **auth).json()
+        foreign = self.client.get(
+            status_url,
+            HTTP_AUTHORIZATION='Token {}'.format(self.another_token),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(pending['status'], ShoppingCartExport.PENDING)
+        self.assertIsNone(pending['file'])
+        self.assertEqual(done['status'], ShoppingCartExport.DONE)
+        self.assertTrue(done['file'].endswith('.pdf'))
+        self.assertEqual(foreign.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_shopping_list_pdf_is_paginated(self):
+        lines = [
+            {
+                'ingredient__name': f'ингредиент {num}',
+                'ingredient__measurement_unit__name': 'г',
+                'amount': num,
+            }
+            for num in range(200)
+        ]
+
+        pdf = create_pdf_from_queryset(lines, self.user.username).getvalue()
+
+        self.assertGreater(pdf.count(b'/Type /Page\n'), 1)
+
     def test_get_subscription_url(self):
         response = self.another_auth_client.get(
             '/api/users/subscriptions/',
@@ -139,6 +550,7 @@ class PostURLTests(RecipeTest):
         data = response.json().get('results')[0]
         request = response.wsgi_request
         request.user = self.another_user
+        self.user.refresh_from_db()
         serializer = SubscriptionSerializer(
             self.user, context={'request': request}
         )
@@ -146,3 +558,201 @@ class PostURLTests(RecipeTest):
         self.assertEqual(data.get('recipes_count'), RECIPE_TO_TEST)
         self.assertEqual(data, serializer.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_subscription_recipes_limit(self):
+        url = '/api/users/subscriptions/?recipes_limit={}'
+        auth = {
+            'HTTP_AUTHORIZATION': 'Token {}'.format(self.another_token)
+        }
+        response = self.client.get(url.format(1), **auth)
+        data = response.json().get('results')[0]
+        latest = Recipe.objects.filter(author=self.user).first()
+        self.assertEqual([item['id'] for item in data['recipes']], [latest.id])
+        self.assertEqual(data['recipes_count'], RECIPE_TO_TEST)
+        self.assertEqual(
+            self.list_queries_count(url.format(1), **auth),
+            self.list_queries_count(url.format(RECIPE_TO_TEST), **auth),
+        )
+
+    def create_extra_recipes(self, number_of_recipes):
+        recipe = Recipe.objects.first()
+        for rec_num in range(number_of_recipes):
+            extra_recipe = Recipe.objects.create(
+                name=f'Extra recipe # {rec_num}',
+                text=recipe.text,
+                cooking_time=recipe.cooking_time,
+                image=recipe.image,
+                author=self.another_user,
+            )
+            extra_recipe.tags.set(recipe.tags.all())
+            RecipeIngredient.objects.create(
+                recipe=extra_recipe,
+                ingredient=Ingredient.objects.last(),
+                amount=rec_num + 1,
+            )
+
+    def list_queries_count(self, url, **extra):
+        cache.clear()
+        token_cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_recipe_update_writes_only_the_difference(self):
+        recipe = Recipe.objects.first()
+        url = f'/api/recipes/{recipe.id}/'
+        auth = {'HTTP_AUTHORIZATION': 'Token {}'.format(self.token)}
+        kept = recipe.recipe_ingredient.get()
+        new_ingredient = Ingredient.objects.exclude(pk=kept.ingredient_id)[0]
+        payload = {
+            'tags': list(recipe.tags.values_list('id', flat=True)),
+            'ingredients': [
+                {'id': kept.ingredient_id, 'amount': kept.amount}
+            ],
+        }
+        relation_tables = ('recipes_recipeingredient', 'recipes_recipetag')
+
+        with CaptureQueriesContext(connection) as context:
+            unchanged = self.client.patch(
+                url, payload, content_type='application/json', **auth
+            )
+        writes = [
+            query['sql']
+            for query in context.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+            and any(table in query['sql'] for table in relation_tables)
+        ]
+        payload['ingredients'] = [
+            {'id': kept.ingredient_id, 'amount': kept.amount + 1},
+            {'id': new_ingredient.id, 'amount': 5},
+        ]
+        changed = self.client.patch(
+            url, payload, content_type='application/json', **auth
+        )
+
+        self.assertEqual(unchanged.status_code, status.HTTP_200_OK)
+        self.assertEqual(writes, [])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (item['id'], item['amount'])
+                for item in changed.json()['ingredients']
+            ],
+            [
+                (kept.ingredient_id, kept.amount + 1),
+                (new_ingredient.id, 5),
+            ],
+        )
+        self.assertTrue(
+            recipe.recipe_ingredient.filter(
+                pk=kept.pk, amount=kept.amount + 1
+            ).exists()
+        )
+
+    def test_recipe_image_renditions(self):
+        recipe = Recipe.objects.first()
+        url = f'/api/recipes/{recipe.id}/'
+        original = self.client.get(url).json()
+
+        create_renditions(recipe.id)
+        rendered = self.client.get(url).json()
+
+        self.assertEqual(
+            set(original['image_renditions'].values()), {original['image']}
+        )
+        self.assertEqual(
+            set(rendered['image_renditions']), set(settings.IMAGE_RENDITIONS)
+        )
+        self.assertIn(
+            '/recipes/renditions/',
+            rendered['image_renditions']['thumbnail'],
+        )
+
+    def test_filter_by_several_tags_returns_recipe_once(self):
+        recipe = Recipe.objects.first()
+        recipe.tags.set(Tag.objects.all())
+        slugs = Tag.objects.values_list('slug', flat=True)
+        query = '&'.join(f'tags={slug}' for slug in slugs)
+
+        response = self.client.get(f'/api/recipes/?{query}')
+        ids = [item['id'] for item in response.json()['results']]
+
+        self.assertEqual(response.json()['count'], Recipe.objects.count())
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_recipe_list_queries_do_not_depend_on_page_size(self):
+        self.create_extra_recipes(RECIPE_TO_TEST * 5)
+        auth = {'HTTP_AUTHORIZATION': 'Token {}'.format(self.token)}
+        for extra in ({}, auth):
+            self.assertEqual(
+                self.list_queries_count('/api/recipes/?limit=1', **extra),
+                self.list_queries_count('/api/recipes/?limit=24', **extra),
+            )
+
+
+@override_settings(IMAGE_RENDITION_WORKERS=0)
+class ConcurrentToggleTest(TransactionTestCase):
+    """Double clicks on toggles must not surface as server errors"""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('in-memory SQLite fails concurrent writers')
+        self.user = User.objects.create_user(
+            username='toggle_user', email='toggle_user@mail.com'
+        )
+        self.author = User.objects.create_user(
+            username='toggle_author', email='toggle_author@mail.com'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.recipe = Recipe.objects.create(
+            name='Рецепт',
+            text='Описание',
+            cooking_time=1,
+            image='recipes/images/toggle.gif',
+            author=self.author,
+        )
+
+    def run_concurrently(self, method, url):
+        barrier = threading.Barrier(CONCURRENT_REQUESTS)
+        statuses = []
+
+        def request():
+            client = Client(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+            barrier.wait()
+            try:
+                statuses.append(getattr(client, method)(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=request)
+            for _ in range(CONCURRENT_REQUESTS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def test_concurrent_toggles(self):
+        rejected = [status.HTTP_400_BAD_REQUEST] * (CONCURRENT_REQUESTS - 1)
+        for url in (
+            f'/api/recipes/{self.recipe.id}/favorite/',
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+            f'/api/users/{self.author.id}/subscribe/',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.run_concurrently('post', url),
+                    [status.HTTP_201_CREATED] + rejected,
+                )
+                self.assertEqual(
+                    self.run_concurrently('delete', url),
+                    [status.HTTP_204_NO_CONTENT] + rejected,
+                )
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+        self.assertEqual(self.recipe.in_carts_count, 0)
+        self.assertEqual(self.author.followers_count, 0)
@@ -1,9 +1,11 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from api.async_views import get_async_urls
 from users.views import CustomUserViewSet
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+from .views import IngredientViewSet, RecipeViewSet, StatsView, TagViewSet
 
 router_v1 = routers.DefaultRouter()
 router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
@@ -12,7 +14,12 @@ router_v1.register('recipes', RecipeViewSet, basename='recipes')
 
 router_v1.register('users', CustomUserViewSet, basename='users')
 
+router_urls = router_v1.urls
+if settings.ASYNC_READ_VIEWS:
+    router_urls = get_async_urls(router_urls)
+
 urlpatterns = [
-    path('', include(router_v1.urls)),
+    path('', include(router_urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('stats/', StatsView.as_view(), name='stats'),
 ]
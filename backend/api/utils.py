@@ -1,15 +1,32 @@
+import hashlib
 import io
+import os
 
+from functools import lru_cache
 from typing import Dict
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils.http import parse_etags
 from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 from rest_framework import exceptions, status
 from rest_framework.response import Response
 
-from recipes.models import RecipeIngredient
+from recipes.models import Recipe, RecipeIngredient
+from recipes.records import delete_records, insert_records
+from recipes.relations import forget_relations
+from recipes.versions import get_cart_version, get_catalogue_version
+
+FONT_NAME = 'DejaVuSerif'
+TITLE_FONT_SIZE = 20
+FONT_SIZE = 12
+PAGE_MARGIN = 50
 
 
 def get_end_letter(value):
@@ -32,19 +49,50 @@ def get_shopping_list_text(
     )
 
 
+def get_etag(key):
+    return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+def is_not_modified(request, etag):
+    return etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+
+@lru_cache()
+def register_pdf_font():
+    """Parse the TTF once per process."""
+    pdfmetrics.registerFont(
+        TTFont(
+            FONT_NAME,
+            os.path.join(settings.BASE_DIR, 'DejaVuSerif.ttf'),
+            'UTF-8',
+        )
+    )
+
+
 def create_pdf_from_queryset(queryset, username):
-    pdfmetrics.registerFont(TTFont('DejaVuSerif', 'DejaVuSerif.ttf', 'UTF-8'))
+    register_pdf_font()
     pdf_file = io.BytesIO()
     w, h = A4
     p = canvas.Canvas(pdf_file, pagesize=A4)
-    text = p.beginText(50, h - 50)
-    text.setFont('DejaVuSerif', 20)
+    text = p.beginText(PAGE_MARGIN, h - PAGE_MARGIN)
+    text.setFont(FONT_NAME, TITLE_FONT_SIZE)
     text.textLine(f'Список покупок для {username}')
     text.textLine(' ')
     text.textLine(' ')
-    text.setFont('DejaVuSerif', 12)
+    text.setFont(FONT_NAME, FONT_SIZE)
     for items in queryset:
-        text.textLine(get_shopping_list_text(**items))
+        for line in simpleSplit(
+            get_shopping_list_text(**items),
+            FONT_NAME,
+            FONT_SIZE,
+            w - 2 * PAGE_MARGIN,
+        ):
+            if text.getY() < PAGE_MARGIN:
+                p.drawText(text)
+                p.showPage()
+                text = p.beginText(PAGE_MARGIN, h - PAGE_MARGIN)
+                text.setFont(FONT_NAME, FONT_SIZE)
+            text.textLine(line)
     p.drawText(text)
     p.showPage()
     p.save()
@@ -52,6 +100,36 @@ def create_pdf_from_queryset(queryset, username):
     return pdf_file
 
 
+def get_shopping_cart_key(user):
+    return ':'.join(
+        (
+            'shopping_cart_pdf',
+            str(user.id),
+            user.username,
+            get_cart_version(user.id),
+            get_catalogue_version(),
+        )
+    )
+
+
+def get_shopping_cart_pdf(user, key=None):
+    """Return the shopping list PDF of a user, rendered or from cache."""
+    key = key or get_shopping_cart_key(user)
+    pdf = cache.get(key)
+    if pdf is not None:
+        return pdf
+    recipes = user.shopping_list.values('recipe__id')
+    buy_list = (
+        RecipeIngredient.objects.filter(recipe__in=recipes)
+        .values('ingredient__name', 'ingredient__measurement_unit__name')
+        .annotate(amount=Sum('amount'))
+        .order_by('ingredient__name')
+    )
+    pdf = create_pdf_from_queryset(buy_list, user.username).getvalue()
+    cache.set(key, pdf, settings.SHOPPING_CART_CACHE_TIMEOUT)
+    return pdf
+
+
 def create_recipe_ingredients(ingredients, recipe):
     RecipeIngredient.objects.bulk_create(
         [
@@ -65,25 +143,111 @@ def create_recipe_ingredients(ingredients, recipe):
     )
 
 
+def update_recipe_ingredients(ingredients, recipe):
+    """Bring recipe ingredients to the list writing only the difference."""
+    amounts = {
+        ingredient['ingredient'].id: ingredient['amount']
+        for ingredient in ingredients
+    }
+    existing = {
+        row.ingredient_id: row for row in recipe.recipe_ingredient.all()
+    }
+    removed = [
+        row.pk
+        for ingredient_id, row in existing.items()
+        if ingredient_id not in amounts
+    ]
+    changed = []
+    for ingredient_id, row in existing.items():
+        if ingredient_id in amounts and row.amount != amounts[ingredient_id]:
+            row.amount = amounts[ingredient_id]
+            changed.append(row)
+    added = [
+        RecipeIngredient(
+            recipe_id=recipe.id, ingredient_id=ingredient_id, amount=amount
+        )
+        for ingredient_id, amount in amounts.items()
+        if ingredient_id not in existing
+    ]
+    if removed:
+        RecipeIngredient.objects.filter(pk__in=removed).delete()
+    if changed:
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+    if added:
+        RecipeIngredient.objects.bulk_create(added)
+    if removed or changed or added:
+        getattr(recipe, '_prefetched_objects_cache', {}).pop(
+            'recipe_ingredient', None
+        )
+
+
+def get_recipes_limit(request):
+    try:
+        recipes_limit = int(request.GET['recipes_limit'])
+    except (AttributeError, KeyError, ValueError):
+        return None
+    return recipes_limit if recipes_limit >= 0 else None
+
+
+def get_latest_recipes(author_ids, limit=None):
+    """Return {author_id: [recipes]} with the latest recipes of authors.
+
+    The limit is applied per author with ROW_NUMBER() in one query, the
+    window annotation is filtered in an outer select because the ORM can
+    not filter on window functions.
+    """
+    recipes = Recipe.objects.filter(author_id__in=author_ids).only(
+        'id',
+        'name',
+        'image',
+        'image_renditions',
+        'cooking_time',
+        'author_id',
+        'pub_date',
+    )
+    if limit is not None:
+        ranked = recipes.annotate(
+            recipe_rank=Window(
+                expression=RowNumber(),
+                partition_by=(F('author_id'),),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )
+        )
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) ranked WHERE recipe_rank <= %s '
+            'ORDER BY author_id, recipe_rank',
+            (*params, limit),
+        )
+    latest = {author_id: [] for author_id in author_ids}
+    for recipe in recipes:
+        latest[recipe.author_id].append(recipe)
+    return latest
+
+
 def get_recipe_serializer():
     from api.serializers import RecipeFavoriteSerializer
 
     return RecipeFavoriteSerializer
 
 
-def create_or_delete_record(request, record, serializer_data, params):
+def create_or_delete_record(request, model, serializer_data, params):
+    """Toggle the (request.user, params) record with a single statement."""
+    ((field_name, related),) = params.items()
     if request.method == 'POST':
-
-        if record.exists():
+        if not insert_records(
+            model, request.user.id, field_name, (related.pk,)
+        ):
             raise exceptions.ValidationError('records already exists.')
-
-        record.create(user=request.user, **params)
+        forget_relations(request.user)
         return Response(serializer_data, status=status.HTTP_201_CREATED)
 
     if request.method == 'DELETE':
-        if not record.exists():
+        if not delete_records(
+            model, request.user.id, field_name, (related.pk,)
+        ):
             raise exceptions.ValidationError('records does not exists.')
-        record.delete()
+        forget_relations(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -1,65 +1,107 @@
-from django.db.models import Case, F, FloatField, Q, Sum, Value, When
-from django.http import FileResponse
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from api.exports import create_export
+from api.fast_serializers import (
+    RECIPE_FIELDS, serialize_ingredients, serialize_recipes,
+)
 from api.filters import RecipeFilter
+from api.mixins import CatalogueCacheMixin
 from api.pagination import CustomPageNumberPagination
 from api.permissions import IsOwnerOrStaffOrReadOnly
 from api.serializers import (
     IngredientSerializer, RecipeCreateUpdateSerializer,
-    RecipeFavoriteSerializer, RecipeSerializer, TagSerializer,
+    RecipeFavoriteSerializer, RecipeIdsSerializer, RecipeSerializer,
+    ShoppingCartExportSerializer, TagSerializer,
 )
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from foodgram.db.pool import get_all_stats
+from recipes import search_index
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCartExport,
+    ShoppingList, Tag,
+)
+from recipes.records import delete_records, insert_records
+from recipes.relations import forget_relations
+from users.authentication import token_cache
 
-from .utils import create_or_delete_record, create_pdf_from_queryset
+from .utils import (
+    create_or_delete_record, get_etag, get_shopping_cart_key,
+    get_shopping_cart_pdf, is_not_modified,
+)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogueCacheMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
 
     def get_queryset(self):
-        string = self.request.query_params.get('name', None)
-        if string is not None:
-            return (
-                Ingredient.objects.select_related('measurement_unit')
-                .filter(
-                    Q(name__istartswith=string) | Q(name__icontains=string)
-                )
-                .annotate(
-                    k1=Case(
-                        When(name__istartswith=string, then=Value(1.0)),
-                        default=Value(0.0),
-                        output_field=FloatField(),
-                    ),
-                    k2=Case(
-                        When(name__icontains=string, then=Value(1.0)),
-                        default=Value(0.0),
-                        output_field=FloatField(),
-                    ),
-                    rank=F("k1") + F("k2"),
-                )
-                .distinct()
-                .order_by('-rank', 'name')
-            )
-        return Ingredient.objects.all()
+        return Ingredient.objects.select_related('measurement_unit')
+
+    def list(self, request, *args, **kwargs):
+        string = request.query_params.get('name', None)
+        if string is None:
+            if settings.FAST_LIST_SERIALIZERS:
+                return self.cached_response(request, self.fast_list)
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = int(request.query_params['limit'])
+        except (KeyError, ValueError):
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        limit = min(max(limit, 1), settings.INGREDIENT_SEARCH_MAX_LIMIT)
+        ingredients = search_index.search(string, limit)
+        if ingredients is None:
+            ingredients = self.get_serializer(
+                self.get_queryset().search(string, limit), many=True
+            ).data
+        return Response(ingredients)
 
+    def fast_list(self, request):
+        return Response(serialize_ingredients(self.get_queryset()))
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(CatalogueCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
     pagination_class = CustomPageNumberPagination
+    keyset_ordering = ('-pub_date', '-id')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (IsOwnerOrStaffOrReadOnly,)
 
+    def get_queryset(self):
+        return Recipe.objects.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'recipe_ingredient',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient__measurement_unit'
+                ).order_by('id'),
+            ),
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_LIST_SERIALIZERS:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(
+            Recipe.objects.values(*RECIPE_FIELDS)
+        )
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serialize_recipes(page, request))
+
     def get_serializer_class(self):
         if self.action in ('create', 'partial_update'):
             return RecipeCreateUpdateSerializer
@@ -68,10 +110,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=('post', 'delete'))
     def favorite(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
-        in_favorite = recipe.in_favorite.filter(user=self.request.user)
         return create_or_delete_record(
             request=request,
-            record=in_favorite,
+            model=Favorite,
             serializer_data=RecipeFavoriteSerializer(recipe).data,
             params={'recipe': recipe},
         )
@@ -79,31 +120,123 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=('post', 'delete'))
     def shopping_cart(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
-        in_shopping_list = recipe.in_shopping_list.filter(
-            user=self.request.user
-        )
         return create_or_delete_record(
             request=request,
-            record=in_shopping_list,
+            model=ShoppingList,
             serializer_data=RecipeFavoriteSerializer(recipe).data,
             params={'recipe': recipe},
         )
 
+    def bulk_records(self, request, model):
+        """Add or remove many recipes, return a status for each of them."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        found = set(
+            Recipe.objects.filter(pk__in=recipe_ids).values_list(
+                'pk', flat=True
+            )
+        )
+        if request.method == 'POST':
+            changed = insert_records(model, request.user.id, 'recipe', found)
+            statuses = ('added', 'already_added')
+        else:
+            changed = delete_records(model, request.user.id, 'recipe', found)
+            statuses = ('removed', 'not_added')
+        forget_relations(request.user)
+        changed = set(changed)
+        return Response(
+            [
+                {
+                    'id': recipe_id,
+                    'status': 'not_found'
+                    if recipe_id not in found
+                    else statuses[recipe_id not in changed],
+                }
+                for recipe_id in recipe_ids
+            ]
+        )
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite',
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_bulk(self, request):
+        return self.bulk_records(request, Favorite)
+
     @action(
-        detail=False, methods=('get',), permission_classes=(IsAuthenticated,)
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk_records(request, ShoppingList)
+
+    @action(
+        detail=False,
+        methods=('get', 'post'),
+        permission_classes=(IsAuthenticated,),
     )
     def download_shopping_cart(self, request):
+        """GET renders the PDF, POST or a large cart queue an export."""
         user = self.request.user
-        recipes = user.shopping_list.values('recipe__id')
+        key = get_shopping_cart_key(user)
+        etag = get_etag(key)
+        if request.method == 'GET' and is_not_modified(request, etag):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+        threshold = settings.SHOPPING_CART_ASYNC_THRESHOLD
+        if request.method == 'POST' or (
+            threshold
+            and key not in cache
+            and user.shopping_list.count() >= threshold
+        ):
+            export = create_export(user)
+            return Response(
+                ShoppingCartExportSerializer(
+                    export, context={'request': request}
+                ).data,
+                status=status.HTTP_202_ACCEPTED,
+            )
+        response = FileResponse(
+            io.BytesIO(get_shopping_cart_pdf(user, key)),
+            as_attachment=True,
+            filename='buy_list.pdf',
+        )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
-        buy_list = (
-            RecipeIngredient.objects.filter(recipe__in=recipes)
-            .values('ingredient__name', 'ingredient__measurement_unit__name')
-            .annotate(amount=Sum('amount'))
-            .order_by('ingredient__name')
+    @action(
+        detail=False,
+        methods=('get',),
+        url_path=r'shopping_cart_exports/(?P<export_id>\d+)',
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_export(self, request, export_id=None):
+        export = get_object_or_404(
+            ShoppingCartExport, pk=export_id, user=request.user
+        )
+        return Response(
+            ShoppingCartExportSerializer(
+                export, context={'request': request}
+            ).data
         )
 
-        pdf_file = create_pdf_from_queryset(buy_list, user.username)
-        return FileResponse(
-            pdf_file, as_attachment=True, filename='buy_list.pdf'
+
+class StatsView(APIView):
+    """Runtime counters of this worker for the staff."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(
+            {
+                'token_cache': token_cache.get_stats(),
+                'databases': get_all_stats(),
+            }
         )
@@ -0,0 +1,186 @@
+"""Database connection reuse for the backends in foodgram.db.
+
+DATABASE_POOL_MODE 'persistent' keeps the connection of a worker thread for
+CONN_MAX_AGE seconds and pings it before its first use in every request.
+'pool' hands connections out of a per-process pool of DATABASE_POOL_SIZE
+connections shared by the threads of threaded and ASGI workers, a checkout
+waits at most DATABASE_POOL_TIMEOUT seconds for a free connection.
+"""
+import threading
+import time
+
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import OperationalError
+
+_lock = threading.Lock()
+_pools = {}
+_stats = {}
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def add(self, **amounts):
+        with self.lock:
+            self.counts.update(amounts)
+
+    def get(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+def get_stats(alias):
+    with _lock:
+        return _stats.setdefault(alias, ConnectionStats())
+
+
+def get_all_stats():
+    """Return {alias: counters} of the connections of this process."""
+    with _lock:
+        stats = {alias: stats.get() for alias, stats in _stats.items()}
+        for alias, pool in _pools.items():
+            stats[alias].update(size=pool.size, idle=len(pool.idle))
+    return stats
+
+
+def ping(connection):
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+    except Exception:
+        return False
+    return True
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """Bounded LIFO pool of DB-API connections."""
+
+    def __init__(self, max_size, timeout, stats):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.stats = stats
+        self.condition = threading.Condition()
+        self.idle = deque()
+        self.size = 0
+
+    def take(self):
+        """Return an idle connection or None to open a new one."""
+        start = time.monotonic()
+        waited = False
+        with self.condition:
+            while not self.idle and self.size >= self.max_size:
+                remaining = start + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self.stats.add(timeouts=1)
+                    raise PoolTimeout('No free database connection')
+                waited = True
+                self.condition.wait(remaining)
+            if waited:
+                self.stats.add(
+                    waits=1, wait_time_ms=(time.monotonic() - start) * 1000
+                )
+            if self.idle:
+                return self.idle.pop()
+            self.size += 1
+            return None
+
+    def acquire(self, connect):
+        while True:
+            connection = self.take()
+            if connection is None:
+                break
+            if ping(connection):
+                self.stats.add(checkouts=1)
+                return connection
+            self.discard(connection)
+        try:
+            connection = connect()
+        except Exception:
+            self.forget()
+            raise
+        self.stats.add(checkouts=1, connections=1)
+        return connection
+
+    def release(self, connection):
+        with self.condition:
+            self.idle.append(connection)
+            self.condition.notify()
+
+    def forget(self):
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    def discard(self, connection):
+        close_quietly(connection)
+        self.stats.add(broken=1)
+        self.forget()
+
+
+def get_pool(alias):
+    with _lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(
+                settings.DATABASE_POOL_SIZE,
+                settings.DATABASE_POOL_TIMEOUT,
+                _stats.setdefault(alias, ConnectionStats()),
+            )
+        return _pools[alias]
+
+
+class PooledDatabaseWrapperMixin:
+    health_check_done = False
+
+    def get_new_connection(self, conn_params):
+        self.health_check_done = True
+        if settings.DATABASE_POOL_MODE != 'pool':
+            get_stats(self.alias).add(connections=1)
+            return super().get_new_connection(conn_params)
+        connect = super().get_new_connection
+        return get_pool(self.alias).acquire(lambda: connect(conn_params))
+
+    def _close(self):
+        if settings.DATABASE_POOL_MODE != 'pool':
+            return super()._close()
+        pool = get_pool(self.alias)
+        try:
+            # the next request must not inherit an open transaction
+            self.connection.rollback()
+        except Exception:
+            pool.discard(self.connection)
+        else:
+            pool.release(self.connection)
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            self.health_check_done = True
+            if not ping(self.connection):
+                get_stats(self.alias).add(broken=1)
+                self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
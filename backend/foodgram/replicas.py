@@ -0,0 +1,125 @@
+"""Read replica routing.
+
+ReplicaMiddleware lets GET and HEAD requests read from one of
+DATABASE_REPLICAS. Everything else goes to the primary: writes, reads that
+follow a write in the same request and, through a short-lived cookie, the
+requests a client sends right after its own write (read-your-writes). A
+replica that cannot be connected to is skipped for REPLICA_RETRY_SECONDS.
+"""
+import asyncio
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+
+# a context variable follows the request into sync_to_async threads
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+_down_until = {}
+
+
+class RequestState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.replica = None
+        self.written = False
+
+
+def is_down(alias):
+    return _down_until.get(alias, 0) > time.monotonic()
+
+
+def get_replica():
+    """Return the alias of a reachable replica or None."""
+    replicas = [
+        alias for alias in settings.DATABASE_REPLICAS if not is_down(alias)
+    ]
+    random.shuffle(replicas)
+    for alias in replicas:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            _down_until[alias] = (
+                time.monotonic() + settings.REPLICA_RETRY_SECONDS
+            )
+            continue
+        return alias
+    return None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is None or not state.use_replica or state.written:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            # one replica per request keeps its reads consistent
+            state.replica = get_replica() or DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # makes the instance look like a coroutine function to Django
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    @staticmethod
+    def get_state(request):
+        return RequestState(
+            bool(settings.DATABASE_REPLICAS)
+            and request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+        )
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = self.get_state(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        state = self.get_state(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.pin(state, response)
+
+    @staticmethod
+    def pin(state, response):
+        if state.written and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE,
+                '1',
+                max_age=settings.DATABASE_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -1,5 +1,6 @@
 import os
 
+from importlib.util import find_spec
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -33,6 +34,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -71,9 +73,65 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='!Q2w3er4'),
         'HOST': os.getenv('DB_HOST', default='localhost'),
         'PORT': os.getenv('DB_PORT', default=5432),
+        'TEST': {'NAME': os.getenv('DB_TEST_NAME')},
     }
 }
 
+# '' opens a connection per request, 'persistent' reuses it for
+# DB_CONN_MAX_AGE seconds with a health check, 'pool' shares DB_POOL_SIZE
+# connections between the threads of a worker
+DATABASE_POOL_MODE = os.getenv('DB_POOL_MODE', 'persistent')
+DATABASE_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DATABASE_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+POOLED_ENGINES = {
+    'django.db.backends.postgresql': 'foodgram.db.postgresql',
+    'django.db.backends.sqlite3': 'foodgram.db.sqlite3',
+}
+if DATABASE_POOL_MODE:
+    DATABASES['default']['ENGINE'] = POOLED_ENGINES.get(
+        DATABASES['default']['ENGINE'], DATABASES['default']['ENGINE']
+    )
+if DATABASE_POOL_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.getenv('DB_CONN_MAX_AGE', 60)
+    )
+
+# comma separated replica hosts, or database files with SQLite
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1
+):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if 'sqlite3' in DATABASES['default']['ENGINE']:
+        DATABASES[alias]['NAME'] = replica
+    else:
+        DATABASES[alias]['HOST'] = replica
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+# reads of a client stay on the primary this long after its write
+DATABASE_PIN_SECONDS = int(os.getenv('DB_PIN_SECONDS', 5))
+REPLICA_RETRY_SECONDS = 30
+
+# use a shared backend (memcached, redis, file) with several workers
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+# version stamps of cached data live in one worker with a local memory
+# cache, they expire quickly there so other workers see changes in time;
+# the catalogue stamp is kept in the database and read again unchanged
+CACHE_VERSION_TIMEOUT = (
+    int(os.getenv('CACHE_VERSION_TIMEOUT', 10))
+    if CACHES['default']['BACKEND'].endswith('LocMemCache')
+    else None
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -107,14 +165,77 @@ AUTH_USER_MODEL = 'users.User'
 NAME_FIELD_MAX_LENGTH = 200
 USER_NAME_MAX_LENGTH = 150
 SLUG_FIELD_MAX_LENGTH = 50
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 50))
+INGREDIENT_SEARCH_MAX_LIMIT = 500
+# memory-mapped autocomplete snapshot shared by workers, SQL search if unset
+INGREDIENT_INDEX_PATH = os.getenv('INGREDIENT_INDEX_PATH')
+CATALOGUE_CACHE_TIMEOUT = 60 * 60
+CATALOGUE_MAX_AGE = int(os.getenv('CATALOGUE_MAX_AGE', 0))
+SHOPPING_CART_CACHE_TIMEOUT = 24 * 60 * 60
+RELATIONS_CACHE_TIMEOUT = 24 * 60 * 60
+RECIPES_BULK_MAX_SIZE = 100
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 30))
+# share token lookups between workers through the default cache
+TOKEN_CACHE_SHARED = os.getenv('TOKEN_CACHE_SHARED', '') == 'True'
+# carts with at least this many recipes are exported in the background,
+# 0 keeps GET synchronous for every cart
+SHOPPING_CART_ASYNC_THRESHOLD = int(
+    os.getenv('SHOPPING_CART_ASYNC_THRESHOLD', 0)
+)
+# export threads per web process, 0 leaves jobs to manage.py process_exports
+SHOPPING_CART_EXPORT_WORKERS = int(
+    os.getenv('SHOPPING_CART_EXPORT_WORKERS', 1)
+)
+# running exports older than this lost their worker, they are queued again
+# until SHOPPING_CART_EXPORT_ATTEMPTS and deleted with the file after TTL
+SHOPPING_CART_EXPORT_TIMEOUT = 10 * 60
+SHOPPING_CART_EXPORT_ATTEMPTS = 3
+SHOPPING_CART_EXPORT_TTL = 24 * 60 * 60
+# media files younger than this may belong to a recipe being saved, they
+# are left to cleanup_media instead of being deleted with their recipe
+MEDIA_MIN_AGE = 60 * 60
+# recipe image renditions, (width, height) caps keep the aspect ratio;
+# WEBP falls back to JPEG when Pillow is built without it
+IMAGE_RENDITIONS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+IMAGE_RENDITION_FORMAT = os.getenv('IMAGE_RENDITION_FORMAT', 'WEBP')
+IMAGE_RENDITION_QUALITY = 80
+# render threads per web process, 0 leaves it to manage.py create_renditions
+IMAGE_RENDITION_WORKERS = int(os.getenv('IMAGE_RENDITION_WORKERS', 2))
+# async read views, enabled by foodgram/asgi.py
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', '') == 'True'
+ASYNC_READ_WORKERS = int(os.getenv('ASYNC_READ_WORKERS', 8))
+# values based serializers for the recipe, ingredient and subscription lists
+FAST_LIST_SERIALIZERS = os.getenv('FAST_LIST_SERIALIZERS', '') == 'True'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+API_RENDERERS = [
+    'api.renderers.ORJSONRenderer',
+    'rest_framework.renderers.BrowsableAPIRenderer',
+]
+API_PARSERS = [
+    'api.parsers.ORJSONParser',
+    'rest_framework.parsers.FormParser',
+    'rest_framework.parsers.MultiPartParser',
+]
+# MessagePack is negotiated by Accept when msgpack is installed
+if find_spec('msgpack'):
+    API_RENDERERS.append('api.renderers.MessagePackRenderer')
+    API_PARSERS.append('api.parsers.MessagePackParser')
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': API_RENDERERS,
+    'DEFAULT_PARSER_CLASSES': API_PARSERS,
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'SEARCH_PARAM': 'name',
 }
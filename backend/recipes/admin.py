@@ -2,7 +2,9 @@ from django.contrib import admin
 
 from api.utils import get_end_letter
 
-from .models import Favorite, Ingredient, Recipe, ShoppingList, Tag, Unit
+from .models import (
+    Favorite, Ingredient, Recipe, ShoppingCartExport, ShoppingList, Tag, Unit,
+)
 
 
 @admin.register(Ingredient)
@@ -45,10 +47,10 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('name', 'author__username', 'tags')
     search_fields = ('name',)
     inlines = (RecipeIngredientsInLine, RecipeTagsInLine)
-    readonly_fields = ('in_favorite',)
+    readonly_fields = ('in_favorite', 'in_carts_count')
 
     def in_favorite(self, obj):
-        label = obj.in_favorite.count()
+        label = obj.favorites_count
         end_letter = get_end_letter(label)
         return f'всего рецепт добавлен в избранное  {label} раз{end_letter}'
 
@@ -65,3 +67,10 @@ class ShoppingListAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
     list_display_links = ('user',)
     list_filter = ('user__username',)
+
+
+@admin.register(ShoppingCartExport)
+class ShoppingCartExportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'created', 'attempts')
+    list_display_links = ('id',)
+    list_filter = ('status',)
@@ -0,0 +1,83 @@
+"""Denormalized counters kept on the rows the counted rows point to.
+
+A model lists its counters as ``counters = ((foreign key, counter), ...)``,
+e.g. Favorite has ``(('recipe', 'favorites_count'),)``. Counters are
+changed with F() expressions in the transaction that creates or deletes the
+rows: by signals for single rows and cascades, by CounterQuerySet for
+bulk_create. refresh_counters() recomputes them from scratch.
+"""
+from collections import Counter
+
+from django.db import models
+from django.db.models.functions import Coalesce, Greatest
+
+
+def get_counters(model):
+    """Return (foreign key field, counter name) pairs of a model."""
+    return [
+        (model._meta.get_field(name), counter)
+        for name, counter in getattr(model, 'counters', ())
+    ]
+
+
+def change_counters(model, objs, delta):
+    """Add delta to the counters of every row the objs point to."""
+    for field, counter in get_counters(model):
+        amounts = Counter(getattr(obj, field.attname) for obj in objs)
+        targets = {}
+        for target_id, amount in amounts.items():
+            targets.setdefault(amount, []).append(target_id)
+        for amount, target_ids in targets.items():
+            field.related_model._base_manager.filter(
+                pk__in=target_ids
+            ).update(
+                **{counter: Greatest(models.F(counter) + amount * delta, 0)}
+            )
+
+
+def refresh_counters(model, objs=None):
+    """Recompute counters of a model, return {counter: fixed rows}.
+
+    Only the rows the objs point to are checked when objs are given.
+    """
+    fixed = {}
+    for field, counter in get_counters(model):
+        rows = model._base_manager.filter(
+            **{field.name: models.OuterRef('pk')}
+        )
+        actual = Coalesce(
+            models.Subquery(
+                rows.order_by()
+                .values(field.name)
+                .annotate(total=models.Count('pk'))
+                .values('total')
+            ),
+            0,
+        )
+        targets = field.related_model._base_manager.all()
+        if objs is not None:
+            targets = targets.filter(
+                pk__in={getattr(obj, field.attname) for obj in objs}
+            )
+        drifted = list(
+            targets.annotate(actual=actual)
+            .exclude(**{counter: models.F('actual')})
+            .values_list('pk', flat=True)
+        )
+        if drifted:
+            field.related_model._base_manager.filter(pk__in=drifted).update(
+                **{counter: actual}
+            )
+        fixed[f'{field.related_model.__name__}.{counter}'] = len(drifted)
+    return fixed
+
+
+class CounterQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if not kwargs.get('ignore_conflicts'):
+            change_counters(self.model, objs, 1)
+            return objs
+        # skipped rows are unknown, count the touched targets again
+        refresh_counters(self.model, objs)
+        return objs
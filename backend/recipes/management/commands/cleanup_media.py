@@ -0,0 +1,77 @@
+import os
+
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.media import get_referenced, is_fresh
+from recipes.models import Recipe
+from recipes.renditions import RENDITIONS_DIR
+
+MEDIA_DIRS = ('recipes/images', RENDITIONS_DIR)
+
+
+def walk(storage, directory):
+    """Yield names of every file under a storage directory."""
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield os.path.join(directory, name)
+    for name in directories:
+        yield from walk(storage, os.path.join(directory, name))
+
+
+class Command(BaseCommand):
+    help = 'Удаление файлов рецептов, на которые не ссылается ни один рецепт'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать файлы, которые будут удалены',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько файлов проверять одним запросом',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=settings.MEDIA_MIN_AGE,
+            help='Не трогать файлы моложе стольких секунд',
+        )
+
+    def get_orphans(self, storage, names):
+        """Orphans of a batch, fresh uploads of unsaved recipes are kept."""
+        return sorted(
+            name
+            for name in set(names) - get_referenced(names)
+            if not is_fresh(storage, name, self.min_age)
+        )
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        self.min_age = options['min_age']
+        checked = orphans = 0
+        for directory in MEDIA_DIRS:
+            files = walk(storage, directory)
+            batch = list(islice(files, options['batch_size']))
+            while batch:
+                checked += len(batch)
+                for name in self.get_orphans(storage, batch):
+                    orphans += 1
+                    if options['dry_run']:
+                        self.stdout.write(name)
+                    else:
+                        storage.delete(name)
+                batch = list(islice(files, options['batch_size']))
+        action = 'would be deleted' if options['dry_run'] else 'deleted'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{checked} files checked, {orphans} orphans {action}'
+            )
+        )
@@ -1,9 +1,14 @@
 import random
 import sys
+import time
 
-from django.core.files.uploadedfile import SimpleUploadedFile
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
-from django.db import IntegrityError
+from django.db import transaction
 
 from recipes.models import (
     Favorite, Ingredient, Recipe, RecipeIngredient, RecipeTag, ShoppingList,
@@ -18,86 +23,214 @@ small_gif = (
     b'\x00\x00\x01\x00\x01\x00\x00\x02'
     b'\x02\x4c\x01\x00\x3b'
 )
+FIXTURE_IMAGE = 'recipes/images/fixture.gif'
+FIXTURE_PASSWORD = 'HasNoPassword'
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#E26C2D', 'lunch'),
+    ('Ужин', '#E26C2D', 'dinner'),
+)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
 
 
 class Command(BaseCommand):
     help = 'Создание тестовых данных'
 
-    @staticmethod
-    def get_random_user():
-        return User.objects.all()[random.randint(0, User.objects.count() - 1)]
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=2, help='Количество пользователей'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=24, help='Количество рецептов'
+        )
+        parser.add_argument(
+            '--favorites-per-user',
+            type=int,
+            default=12,
+            help='Рецептов в избранном и в корзине у каждого пользователя',
+        )
+        parser.add_argument(
+            '--follows-per-user',
+            type=int,
+            default=1,
+            help='Подписок у каждого пользователя',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=None, help='Seed для random'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Размер пачки для bulk_create',
+        )
 
-    def handle(self, *args, **options):
+    def bulk_insert(self, model, objects):
+        """Insert objects in batches, one transaction per batch."""
+        total = 0
+        for batch in batches(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            total += len(batch)
+        self.stdout.write(f'{model.__name__}: {total}')
+        return total
 
-        test_image = SimpleUploadedFile(
-            name='small.gif', content=small_gif, content_type='image/gif'
+    @staticmethod
+    def new_ids(model, last_id):
+        return list(
+            model.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)
         )
-        try:
-            user = User.objects.create_user(
-                username='HasNoName',
-                email='HasNoEmail@mail.com',
-                first_name='HasNoFirstName',
-                last_name='HasNoLastName',
-                password='HasNoPassword',
-            )
-            another_user = User.objects.create_user(
-                username='HasNoName1',
-                email='HasNoEmail1@mail.com',
-                first_name='HasNoFirstName1',
-                last_name='HasNoLastName1',
-                password='HasNoPassword',
-            )
 
-            Follow.objects.create(user=another_user, author=user)
-            Follow.objects.create(user=user, author=another_user)
+    @staticmethod
+    def last_id(model):
+        last = model.objects.order_by('-pk').values_list('pk', flat=True)
+        return last.first() or 0
 
-            if not Tag.objects.exists():
-                Tag.objects.create(
-                    name='Завтрак', color='#E26C2D', slug='breakfast'
+    def create_users(self, count):
+        last_id = self.last_id(User)
+        password = make_password(FIXTURE_PASSWORD)
+        names = [
+            f'HasNoName{num or ""}'
+            for num in range(2)
+            if not User.objects.filter(
+                username=f'HasNoName{num or ""}'
+            ).exists()
+        ]
+        names += [f'fixture_user_{last_id + num}' for num in range(count)]
+        self.bulk_insert(
+            User,
+            (
+                User(
+                    username=name,
+                    email=f'{name}@mail.com',
+                    first_name=f'{name}FirstName',
+                    last_name=f'{name}LastName',
+                    password=password,
                 )
-                Tag.objects.create(name='Обед', color='#E26C2D', slug='lunch')
-                Tag.objects.create(name='Ужин', color='#E26C2D', slug='dinner')
-
-            for rec_num in range(24):
-                recipe = Recipe.objects.create(
-                    name=f'Recipe # {rec_num}',
-                    text=f'Тестовый рецепт {rec_num}',
-                    cooking_time=random.randint(1, 25),
-                    image=test_image,
-                    author=self.get_random_user(),
+                for name in names[:count]
+            ),
+        )
+        return self.new_ids(User, last_id)
+
+    def create_follows(self, user_ids, follows_per_user):
+        authors_count = min(follows_per_user, len(user_ids) - 1)
+        if authors_count < 1:
+            return
+        self.bulk_insert(
+            Follow,
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in [
+                    author_id
+                    for author_id in self.random.sample(
+                        user_ids, authors_count + 1
+                    )
+                    if author_id != user_id
+                ][:authors_count]
+            ),
+        )
+
+    def create_recipes(self, count, author_ids):
+        if not default_storage.exists(FIXTURE_IMAGE):
+            default_storage.save(FIXTURE_IMAGE, ContentFile(small_gif))
+        last_id = self.last_id(Recipe)
+        self.bulk_insert(
+            Recipe,
+            (
+                Recipe(
+                    name=f'Recipe # {last_id + num}',
+                    text=f'Тестовый рецепт {last_id + num}',
+                    cooking_time=self.random.randint(1, 25),
+                    image=FIXTURE_IMAGE,
+                    author_id=self.random.choice(author_ids),
                 )
-                Favorite.objects.create(
-                    recipe=recipe, user=self.get_random_user()
+                for num in range(count)
+            ),
+        )
+        return self.new_ids(Recipe, last_id)
+
+    def create_recipe_relations(self, recipe_ids):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in TAGS
+            )
+        tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        self.bulk_insert(
+            RecipeTag,
+            (
+                RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in tag_ids[: self.random.randint(1, 3)]
+            ),
+        )
+        ingredient_ids = list(Ingredient.objects.values_list('pk', flat=True))
+        if not ingredient_ids:
+            self.stdout.write(
+                self.style.WARNING('No ingredients, run import_csv first')
+            )
+            return
+        self.bulk_insert(
+            RecipeIngredient,
+            (
+                RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.random.randint(1, 200),
                 )
-                ShoppingList.objects.create(
-                    recipe=recipe, user=self.get_random_user()
+                for recipe_id in recipe_ids
+                for ingredient_id in self.random.sample(
+                    ingredient_ids,
+                    min(self.random.randint(1, 5), len(ingredient_ids)),
                 )
+            ),
+        )
 
-                for num in range(random.randint(1, 3)):
-                    RecipeTag.objects.create(
-                        recipe=recipe, tag=Tag.objects.all()[num]
-                    )
-                for num in range(random.randint(1, 5)):
-                    try:
-                        RecipeIngredient.objects.create(
-                            recipe=recipe,
-                            ingredient=Ingredient.objects.all()[
-                                random.randint(
-                                    0,
-                                    Ingredient.objects.count() - 1
-                                )
-                            ],
-                            amount=random.randint(1, 200),
-                        )
-                    except IntegrityError as error:
-                        self.stdout.write(
-                            self.style.ERROR(error),
-                        )
+    def create_user_lists(self, user_ids, recipe_ids, per_user):
+        per_user = min(per_user, len(recipe_ids))
+        for model in (Favorite, ShoppingList):
+            self.bulk_insert(
+                model,
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in self.random.sample(recipe_ids, per_user)
+                ),
+            )
 
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        start = time.monotonic()
+        try:
+            user_ids = self.create_users(options['users'])
+            self.create_follows(user_ids, options['follows_per_user'])
+            author_ids = user_ids or list(
+                User.objects.values_list('pk', flat=True)
+            )
+            recipe_ids = self.create_recipes(options['recipes'], author_ids)
+            self.create_recipe_relations(recipe_ids)
+            self.create_user_lists(
+                user_ids, recipe_ids, options['favorites_per_user']
+            )
         except Exception as error:
             self.stdout.write(
                 self.style.ERROR(f'Error loading model {error}'),
             )
             sys.exit()
 
-        self.stdout.write(self.style.SUCCESS(' Foodgram Objects Created'))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f' Foodgram Objects Created in {time.monotonic() - start:.1f}s'
+            )
+        )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.renditions import create_renditions, needs_renditions
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии для всех рецептов',
+        )
+
+    def handle(self, *args, **options):
+        recipe_ids = [
+            recipe.pk
+            for recipe in Recipe.objects.only(
+                'image', 'image_renditions'
+            ).iterator()
+            if recipe.image and (options['all'] or needs_renditions(recipe))
+        ]
+        failed = 0
+        for recipe_id in recipe_ids:
+            try:
+                create_renditions(recipe_id)
+            except Exception as error:
+                failed += 1
+                self.stdout.write(
+                    self.style.ERROR(f'Recipe {recipe_id}: {error}')
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{len(recipe_ids) - failed} recipes rendered, '
+                f'{failed} failed'
+            )
+        )
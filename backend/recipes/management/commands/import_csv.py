@@ -1,35 +1,201 @@
 import csv
+import io
+import json
+import re
 import sys
 
+from functools import partial
+from itertools import islice
+
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
 
 from recipes.models import Ingredient, Unit
+from recipes.signals import ingredients_changed
+
+COPY_SQL = 'COPY import_ingredient (name, unit) FROM STDIN WITH (FORMAT csv)'
+JSON_CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_items(source, chunk_size=JSON_CHUNK_SIZE):
+    """Yield items of a top-level JSON array reading it by chunks."""
+    decoder = json.JSONDecoder()
+    chunks = iter(partial(source.read, chunk_size), '')
+    buffer = next((chunk.lstrip() for chunk in chunks if chunk.strip()), '')
+    if not buffer.startswith('['):
+        raise ValueError('JSON array expected')
+    position, eof = 1, False
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        if buffer.startswith(',', position):
+            position = WHITESPACE.match(buffer, position + 1).end()
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            end = None
+        # an item ending the buffer may be cut, e.g. a number
+        if end is not None and (end < len(buffer) or eof):
+            yield item
+            position = end
+            continue
+        if eof:
+            raise ValueError('Unexpected end of JSON array')
+        chunk = next(chunks, '')
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def read_rows(file_path, file_format):
+    """Yield (name, measurement_unit) pairs from a csv or json file."""
+    with open(file_path, 'r', encoding='utf-8') as source:
+        if file_format == 'json':
+            for item in iter_json_items(source):
+                yield item['name'], item['measurement_unit']
+            return
+        for row in csv.reader(source):
+            yield row[0], row[1]
+
+
+class CsvStream:
+    """Read-only file of rows rendered as CSV a batch at a time."""
+
+    def __init__(self, rows, batch_size):
+        self.rows = iter(rows)
+        self.batch_size = batch_size
+        self.buffer = io.StringIO()
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.buffer.read(size)
+        while size < 0 or len(data) < size:
+            batch = list(islice(self.rows, self.batch_size))
+            if not batch:
+                break
+            self.count += len(batch)
+            self.buffer = io.StringIO()
+            csv.writer(self.buffer).writerows(batch)
+            self.buffer.seek(0)
+            data += self.buffer.read(size - len(data) if size >= 0 else -1)
+        return data
 
 
 class Command(BaseCommand):
-    help = 'Импорт данных из csv в модель Ingredient'
+    help = 'Импорт данных из csv или json в модель Ingredient'
 
     def add_arguments(self, parser):
         parser.add_argument('--path', type=str, help='Путь к файлу')
+        parser.add_argument(
+            '--format',
+            choices=('csv', 'json'),
+            default=None,
+            help='Формат файла, по умолчанию по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Размер пачки для bulk_create и COPY',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY на PostgreSQL',
+        )
 
-    def handle(self, *args, **options):
-        params_for_create = []
+    def get_unit_ids(self, names):
+        """Return unit ids for names, creating missing units."""
+        missing = set(names) - set(self.units)
+        if missing:
+            Unit.objects.bulk_create(
+                (Unit(name=name) for name in missing), ignore_conflicts=True
+            )
+            self.units.update(
+                Unit.objects.filter(name__in=missing).values_list('name', 'id')
+            )
+        return self.units
+
+    def import_batch(self, rows):
+        """Insert new ingredients of a batch, return the inserted count."""
+        units = self.get_unit_ids(unit for _, unit in rows)
+        keys = {(name, units[unit]) for name, unit in rows}
+        existing = set(
+            Ingredient.objects.filter(
+                name__in={name for name, _ in keys}
+            ).values_list('name', 'measurement_unit_id')
+        )
+        new = keys - existing - self.seen
+        self.seen |= new
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name, measurement_unit_id=unit_id)
+                for name, unit_id in new
+            ),
+            ignore_conflicts=True,
+        )
+        return len(new)
 
+    def import_rows(self, rows, batch_size):
+        self.units = dict(Unit.objects.values_list('name', 'id'))
+        self.seen = set()
+        total = inserted = 0
+        batch = list(islice(rows, batch_size))
+        while batch:
+            with transaction.atomic():
+                inserted += self.import_batch(batch)
+            total += len(batch)
+            batch = list(islice(rows, batch_size))
+        return total, inserted
+
+    @staticmethod
+    def copy_rows(rows, batch_size):
+        """Stream rows through a COPY into a staging table (PostgreSQL)."""
+        stream = CsvStream(rows, batch_size)
+        unit_table = Unit._meta.db_table
+        ingredient_table = Ingredient._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE import_ingredient '
+                '(name text, unit text) ON COMMIT DROP'
+            )
+            cursor.copy_expert(COPY_SQL, stream)
+            total = stream.count
+            cursor.execute(
+                f'INSERT INTO {unit_table} (name, description) '
+                "SELECT DISTINCT unit, '' FROM import_ingredient "
+                'ON CONFLICT (name) DO NOTHING'
+            )
+            cursor.execute(
+                f'INSERT INTO {ingredient_table} '
+                '(name, measurement_unit_id, search_name) '
+                'SELECT DISTINCT staging.name, unit.id, lower(staging.name) '
+                'FROM import_ingredient staging '
+                f'JOIN {unit_table} unit ON unit.name = staging.unit '
+                'ON CONFLICT ON CONSTRAINT unique_ingredient DO NOTHING'
+            )
+            inserted = cursor.rowcount
+        return total, inserted
+
+    def handle(self, *args, **options):
         try:
             file_path = options['path']
-            with open(file_path, 'r', encoding='utf-8') as csv_file:
-                reader = csv.reader(csv_file)
-                for row in reader:
-                    unit_obj, created = Unit.objects.get_or_create(name=row[1])
-                    params = {
-                        'name': row[0],
-                        'measurement_unit_id': unit_obj.id,
-                    }
-                    params_for_create.append(params)
-
-            Ingredient.objects.bulk_create(
-                [Ingredient(**parameters) for parameters in params_for_create]
+            file_format = options['format'] or (
+                'json' if file_path.endswith('.json') else 'csv'
             )
+            rows = read_rows(file_path, file_format)
+            if connection.vendor == 'postgresql' and not options['no_copy']:
+                total, inserted = self.copy_rows(
+                    rows, options['batch_size']
+                )
+            else:
+                total, inserted = self.import_rows(
+                    rows, options['batch_size']
+                )
+            if inserted:
+                ingredients_changed()
         except Exception as error:
             self.stdout.write(
                 self.style.ERROR(f'Error loading model {error}'),
@@ -38,6 +204,7 @@ class Command(BaseCommand):
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'{len(params_for_create)}' ' Ingredient Objects Created'
+                f'{inserted} Ingredient Objects Created, '
+                f'{total - inserted} skipped'
             )
         )
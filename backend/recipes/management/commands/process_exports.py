@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.exports import (
+    delete_expired_exports, process_pending_exports, recover_stuck_exports,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Обработка очереди выгрузок списка покупок, повтор прерванных '
+        'и удаление устаревших выгрузок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь один раз и завершиться',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Пауза между проверками очереди, секунд',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            requeued, failed = recover_stuck_exports()
+            if requeued or failed:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f'{requeued} stuck exports requeued, {failed} failed'
+                    )
+                )
+            processed = process_pending_exports()
+            if processed:
+                self.stdout.write(
+                    self.style.SUCCESS(f'{processed} exports processed')
+                )
+            deleted = delete_expired_exports()
+            if deleted:
+                self.stdout.write(
+                    self.style.SUCCESS(f'{deleted} expired exports deleted')
+                )
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import get_counters, refresh_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, корзин, рецептов и подписчиков'
+
+    def handle(self, *args, **options):
+        for model in apps.get_models():
+            if not get_counters(model):
+                continue
+            with transaction.atomic():
+                fixed = refresh_counters(model)
+            for counter, rows in fixed.items():
+                self.stdout.write(f'{counter}: {rows} fixed')
+        self.stdout.write(self.style.SUCCESS('Counters are up to date'))
@@ -0,0 +1,59 @@
+"""Recipe media references.
+
+A stored file is referenced while a recipe uses it as the image or as one
+of the image renditions. Content addressed names make several recipes share
+a file, so files are deleted only when no recipe refers to them any more.
+"""
+import time
+
+from django.conf import settings
+from django.db.models import Q
+
+from recipes.models import Recipe
+
+
+def get_recipe_files(recipe):
+    files = {recipe.image.name} if recipe.image else set()
+    files.update(
+        recipe.image_renditions.get(name)
+        for name in settings.IMAGE_RENDITIONS
+        if recipe.image_renditions.get(name)
+    )
+    return files
+
+
+def get_referenced(names):
+    """Return the subset of file names used by any recipe."""
+    names = list(names)
+    condition = Q(image__in=names)
+    for rendition in settings.IMAGE_RENDITIONS:
+        condition |= Q(**{f'image_renditions__{rendition}__in': names})
+    referenced = set()
+    for recipe in Recipe.objects.filter(condition).only(
+        'image', 'image_renditions'
+    ):
+        referenced |= get_recipe_files(recipe)
+    return referenced & set(names)
+
+
+def is_fresh(storage, name, min_age):
+    """Whether a file was written or reused less than min_age ago."""
+    deadline = time.time() - min_age
+    return storage.get_modified_time(name).timestamp() >= deadline
+
+
+def release_files(names):
+    """Delete files that are not referenced any more.
+
+    References are checked right before each file is deleted, fresh files
+    may already be used by a recipe that is not committed yet.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    for name in names:
+        if (
+            not storage.exists(name)
+            or is_fresh(storage, name, settings.MEDIA_MIN_AGE)
+            or get_referenced([name])
+        ):
+            continue
+        storage.delete(name)
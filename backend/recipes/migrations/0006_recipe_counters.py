@@ -0,0 +1,53 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:59
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes', 'Favorite', 'recipe', 'recipes', 'Recipe', 'favorites_count'),
+    ('recipes', 'ShoppingList', 'recipe', 'recipes', 'Recipe', 'in_carts_count'),
+    ('recipes', 'Recipe', 'author', 'users', 'User', 'recipes_count'),
+    ('users', 'Follow', 'author', 'users', 'User', 'followers_count'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for app, model, field, target_app, target, counter in COUNTERS:
+        rows = apps.get_model(app, model).objects.filter(
+            **{field: models.OuterRef('pk')}
+        )
+        apps.get_model(target_app, target).objects.update(
+            **{
+                counter: Coalesce(
+                    models.Subquery(
+                        rows.order_by()
+                        .values(field)
+                        .annotate(total=models.Count('pk'))
+                        .values('total')
+                    ),
+                    0,
+                )
+            }
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_pub_date_id_idx'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+def delete_duplicate_recipe_tags(apps, schema_editor):
+    RecipeTag = apps.get_model('recipes', 'RecipeTag')
+    first_ids = (
+        RecipeTag.objects.values('recipe', 'tag')
+        .annotate(first_id=models.Min('id'))
+        .values('first_id')
+    )
+    RecipeTag.objects.exclude(id__in=first_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            delete_duplicate_recipe_tags, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='recipetag',
+            index=models.Index(fields=['tag', 'recipe'], name='recipetag_tag_recipe_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipetag',
+            constraint=models.UniqueConstraint(fields=('recipe', 'tag'), name='unique__recipe_tag'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:04
+
+import uuid
+
+from django.db import migrations, models
+
+
+def create_catalogue_version(apps, schema_editor):
+    CacheVersion = apps.get_model('recipes', 'CacheVersion')
+    CacheVersion.objects.create(
+        key='catalogue_version', value=uuid.uuid4().hex
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_shoppingcartexport_claimed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Ключ')),
+                ('value', models.CharField(max_length=32, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'версия кэша',
+                'verbose_name_plural': 'Версии кэша',
+            },
+        ),
+        migrations.RunPython(
+            create_catalogue_version, migrations.RunPython.noop
+        ),
+    ]
@@ -1,9 +1,19 @@
 from django.conf import settings
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models.functions import Collate
 
+from recipes.counters import CounterQuerySet
+from recipes.storage import ContentAddressedStorage
 from users.models import User
 
+# upper bound for a prefix range scan on backends without pattern indexes
+PREFIX_RANGE_END = chr(0x10FFFF)
+
+
+def normalize_search_name(name):
+    return name.lower()
+
 
 class Tag(models.Model):
     """Foodgram tag model"""
@@ -59,6 +69,43 @@ class Unit(models.Model):
         return self.name
 
 
+class IngredientQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.search_name = normalize_search_name(obj.name)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def search(self, string, limit):
+        """Prefix matches first, then substring matches, both by name.
+
+        Prefix lookups use the search_name b-tree index, substring lookups
+        the trigram GIN index on PostgreSQL. Names are ordered by code point
+        like the autocomplete snapshot, the "C" collation does it on
+        PostgreSQL, SQLite compares them that way by default.
+        """
+        string = normalize_search_name(string)
+        if connections[self.db].vendor == 'postgresql':
+            prefix = models.Q(search_name__startswith=string)
+            ordering = (
+                Collate('search_name', 'C'),
+                Collate('name', 'C'),
+                'id',
+            )
+        else:
+            prefix = models.Q(
+                search_name__gte=string,
+                search_name__lt=string + PREFIX_RANGE_END,
+            )
+            ordering = ('search_name', 'name', 'id')
+        found = list(self.filter(prefix).order_by(*ordering)[:limit])
+        if len(found) < limit:
+            found += self.filter(search_name__contains=string).exclude(
+                prefix
+            ).order_by(*ordering)[: limit - len(found)]
+        return found
+
+
 class Ingredient(models.Model):
     """Foodgram Ingredient Model"""
 
@@ -73,6 +120,14 @@ class Ingredient(models.Model):
         related_name='units',
         verbose_name='Единица измерения ингредиента',
     )
+    search_name = models.CharField(
+        max_length=settings.NAME_FIELD_MAX_LENGTH,
+        db_index=True,
+        editable=False,
+        verbose_name='Название для поиска',
+    )
+
+    objects = IngredientQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'ингредиент'
@@ -87,6 +142,10 @@ class Ingredient(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_search_name(self.name)
+        super().save(*args, **kwargs)
+
 
 class Recipe(models.Model):
     """Foodgram Recipe Model"""
@@ -116,6 +175,12 @@ class Recipe(models.Model):
         verbose_name='Изображение для рецепта',
         help_text='Изображение для рецепта',
         upload_to='recipes/images/',
+        storage=ContentAddressedStorage(),
+    )
+    image_renditions = models.JSONField(
+        default=dict,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения',
     )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации рецепта',
@@ -134,11 +199,25 @@ class Recipe(models.Model):
         verbose_name='Теги рецепта',
         help_text='Теги рецепта',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='В списках покупок'
+    )
+
+    objects = CounterQuerySet.as_manager()
+    counters = (('author', 'recipes_count'),)
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id_idx'
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=('author', 'name'), name='unique__author_name'
@@ -185,6 +264,18 @@ class RecipeTag(models.Model):
     )
     tag = models.ForeignKey(Tag, on_delete=models.PROTECT, verbose_name='Тег')
 
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('tag', 'recipe'), name='recipetag_tag_recipe_idx'
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'tag'), name='unique__recipe_tag'
+            ),
+        )
+
     def __str__(self):
         return f'{self.tag} in {self.recipe} tags'
 
@@ -205,6 +296,9 @@ class Favorite(models.Model):
         verbose_name='Рецепт',
     )
 
+    objects = CounterQuerySet.as_manager()
+    counters = (('recipe', 'favorites_count'),)
+
     class Meta:
         verbose_name = 'избранное'
         verbose_name_plural = 'Избранное'
@@ -235,6 +329,9 @@ class ShoppingList(models.Model):
         verbose_name='Рецепт',
     )
 
+    objects = CounterQuerySet.as_manager()
+    counters = (('recipe', 'in_carts_count'),)
+
     class Meta:
         verbose_name = 'список покупок'
         verbose_name_plural = 'Список покупок'
@@ -247,3 +344,67 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'{self.recipe} in {self.user} shopping list'
+
+
+class CacheVersion(models.Model):
+    """Version stamp every worker reads the same"""
+
+    key = models.CharField(max_length=100, unique=True, verbose_name='Ключ')
+    value = models.CharField(max_length=32, verbose_name='Версия')
+
+    class Meta:
+        verbose_name = 'версия кэша'
+        verbose_name_plural = 'Версии кэша'
+
+    def __str__(self):
+        return f'{self.key}: {self.value}'
+
+
+class ShoppingCartExport(models.Model):
+    """Background shopping list export"""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_exports',
+        verbose_name='Пользователь',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        db_index=True,
+        verbose_name='Статус',
+    )
+    file = models.FileField(
+        upload_to='exports/', blank=True, verbose_name='Файл'
+    )
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    created = models.DateTimeField(
+        auto_now_add=True, verbose_name='Дата создания'
+    )
+    claimed = models.DateTimeField(
+        null=True, blank=True, verbose_name='Дата начала обработки'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Попыток обработки'
+    )
+
+    class Meta:
+        ordering = ('created',)
+        verbose_name = 'выгрузка списка покупок'
+        verbose_name_plural = 'Выгрузки списка покупок'
+
+    def __str__(self):
+        return f'Выгрузка {self.pk} для {self.user}: {self.status}'
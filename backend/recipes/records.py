@@ -0,0 +1,60 @@
+"""Single statement inserts and deletes of a user's records.
+
+Favorite, ShoppingList and Follow rows are added with INSERT ... ON CONFLICT
+DO NOTHING RETURNING and removed with DELETE ... RETURNING, so concurrent
+requests never trip the unique constraints and the caller learns which rows
+really changed. No signals are sent for these statements, records_changed()
+does their bookkeeping in the same transaction.
+"""
+from django.db import connections, router, transaction
+
+from recipes.signals import records_changed
+
+
+def get_names(model, field_name, connection):
+    """Return quoted table, user column and field column names."""
+    quote_name = connection.ops.quote_name
+    return (
+        quote_name(model._meta.db_table),
+        quote_name(model._meta.get_field('user').column),
+        quote_name(model._meta.get_field(field_name).column),
+    )
+
+
+def run_statement(model, user_id, field_name, values, delta):
+    values = list(dict.fromkeys(values))
+    if not values:
+        return []
+    using = router.db_for_write(model)
+    connection = connections[using]
+    table, user_column, column = get_names(model, field_name, connection)
+    if delta > 0:
+        rows = ', '.join(['(%s, %s)'] * len(values))
+        sql = (
+            f'INSERT INTO {table} ({user_column}, {column}) VALUES {rows} '
+            f'ON CONFLICT DO NOTHING RETURNING {column}'
+        )
+        params = [param for value in values for param in (user_id, value)]
+    else:
+        placeholders = ', '.join(['%s'] * len(values))
+        sql = (
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {column} IN ({placeholders}) RETURNING {column}'
+        )
+        params = [user_id, *values]
+    with transaction.atomic(using=using, savepoint=False):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            changed = [row[0] for row in cursor.fetchall()]
+        records_changed(model, user_id, field_name, changed, delta)
+    return changed
+
+
+def insert_records(model, user_id, field_name, values):
+    """Add (user, value) rows, return the values that were inserted."""
+    return run_statement(model, user_id, field_name, values, 1)
+
+
+def delete_records(model, user_id, field_name, values):
+    """Remove (user, value) rows, return the values that were deleted."""
+    return run_statement(model, user_id, field_name, values, -1)
@@ -0,0 +1,83 @@
+"""Favorites, shopping cart and follows of a user as sorted id arrays.
+
+The arrays are loaded with one query, kept in the shared cache under the
+user's relations version and memoized on the user object for the rest of
+the request, so serializers and filters answer membership without queries.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import IntegerField, Value
+
+from recipes.models import Favorite, ShoppingList
+from recipes.versions import get_relations_version
+from users.models import Follow
+
+RELATIONS_KEY = 'relations:{}:{}'
+FAVORITES, CART, FOLLOWS = range(3)
+
+
+class Ids:
+    """Sorted array of ids with bisect membership."""
+
+    def __init__(self, ids=()):
+        self.ids = array('q', sorted(ids))
+
+    def __contains__(self, value):
+        position = bisect_left(self.ids, value)
+        return position < len(self.ids) and self.ids[position] == value
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class UserRelations:
+    def __init__(self, favorites=(), cart=(), follows=()):
+        self.favorites = Ids(favorites)
+        self.cart = Ids(cart)
+        self.follows = Ids(follows)
+
+
+ANONYMOUS_RELATIONS = UserRelations()
+
+
+def load_relations(user_id):
+    def related(model, kind, field):
+        return model.objects.filter(user_id=user_id).values_list(
+            Value(kind, output_field=IntegerField()), field
+        )
+
+    relations = ([], [], [])
+    for kind, related_id in related(Favorite, FAVORITES, 'recipe_id').union(
+        related(ShoppingList, CART, 'recipe_id'),
+        related(Follow, FOLLOWS, 'author_id'),
+        all=True,
+    ):
+        relations[kind].append(related_id)
+    return UserRelations(*relations)
+
+
+def get_relations(user):
+    """Return UserRelations of a user, memoized for the request."""
+    if not user.is_authenticated:
+        return ANONYMOUS_RELATIONS
+    relations = getattr(user, '_relations', None)
+    if relations is not None:
+        return relations
+    key = RELATIONS_KEY.format(user.id, get_relations_version(user.id))
+    relations = cache.get(key)
+    if relations is None:
+        relations = load_relations(user.id)
+        cache.set(key, relations, settings.RELATIONS_CACHE_TIMEOUT)
+    user._relations = relations
+    return relations
+
+
+def forget_relations(user):
+    """Drop relations memoized on the user after they changed."""
+    user.__dict__.pop('_relations', None)
@@ -0,0 +1,135 @@
+"""Pre-generated recipe image renditions.
+
+Renditions are rendered after commit in a bounded thread pool, or by the
+create_renditions command when the pool is disabled. Recipe.image_renditions
+maps rendition names to stored files and remembers the source image, so a
+recipe is rendered again only after its image changed and clients get the
+original until then.
+"""
+import io
+import logging
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from recipes.media import release_files
+from recipes.models import Recipe
+
+RENDITIONS_DIR = 'recipes/renditions'
+SOURCE_KEY = 'source'
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache()
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_RENDITION_WORKERS,
+        thread_name_prefix='image-rendition',
+    )
+
+
+@lru_cache()
+def get_format():
+    """WebP when Pillow is built with it, JPEG otherwise."""
+    if settings.IMAGE_RENDITION_FORMAT == 'WEBP' and not features.check(
+        'webp'
+    ):
+        return 'JPEG'
+    return settings.IMAGE_RENDITION_FORMAT
+
+
+def render(image, size, image_format):
+    """Return image bytes downscaled to fit size, never upscaled."""
+    rendition = image.copy()
+    rendition.thumbnail(size)
+    mode = 'RGB' if image_format == 'JPEG' else 'RGBA'
+    if rendition.mode not in ('RGB', mode):
+        rendition = rendition.convert(mode)
+    buffer = io.BytesIO()
+    rendition.save(
+        buffer, image_format, quality=settings.IMAGE_RENDITION_QUALITY
+    )
+    return buffer.getvalue()
+
+
+def get_rendition_name(source, name, image_format):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f'{RENDITIONS_DIR}/{stem}_{name}.{EXTENSIONS[image_format]}'
+
+
+def get_rendition_files(image, renditions):
+    """Return {rendition: file name}, the original for missing ones."""
+    if renditions.get(SOURCE_KEY) != image:
+        renditions = {}
+    return {
+        name: renditions.get(name, image)
+        for name in settings.IMAGE_RENDITIONS
+    }
+
+
+def get_renditions(recipe):
+    return get_rendition_files(recipe.image.name, recipe.image_renditions)
+
+
+def create_renditions(recipe_id):
+    """Render every rendition of the recipe image and store the map.
+
+    Renditions of the previous image are released once replaced.
+    """
+    recipe = Recipe.objects.only('image', 'image_renditions').get(
+        pk=recipe_id
+    )
+    source = recipe.image.name
+    storage = recipe.image.storage
+    image_format = get_format()
+    renditions = {SOURCE_KEY: source}
+    with recipe.image.open('rb') as image_file, Image.open(
+        image_file
+    ) as image:
+        image = ImageOps.exif_transpose(image)
+        for name, size in settings.IMAGE_RENDITIONS.items():
+            renditions[name] = storage.save(
+                get_rendition_name(source, name, image_format),
+                ContentFile(render(image, size, image_format)),
+            )
+    replaced = {
+        recipe.image_renditions[name]
+        for name in settings.IMAGE_RENDITIONS
+        if recipe.image_renditions.get(name)
+    } - set(renditions.values())
+    if Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_renditions=renditions
+    ):
+        transaction.on_commit(lambda: release_files(replaced))
+    return renditions
+
+
+def run_renditions(recipe_id):
+    try:
+        create_renditions(recipe_id)
+    except Exception:
+        logger.exception('Renditions of recipe %s failed', recipe_id)
+    finally:
+        connection.close()
+
+
+def needs_renditions(recipe):
+    return bool(recipe.image) and (
+        recipe.image_renditions.get(SOURCE_KEY) != recipe.image.name
+    )
+
+
+def schedule_renditions(recipe_id):
+    """Hand the recipe to the worker pool after commit."""
+    if settings.IMAGE_RENDITION_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_renditions, recipe_id)
+        )
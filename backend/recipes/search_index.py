@@ -0,0 +1,285 @@
+"""Memory-mapped ingredient autocomplete index.
+
+The snapshot file holds ingredients sorted by their normalized name plus a
+trigram index of record numbers. Every worker maps the same file, so the
+operating system page cache keeps a single copy of it. A worker notices a
+new snapshot by its stat signature. The header holds the catalogue version
+the rows were read at, a worker falls back to SQL while the file is missing
+or its version is not the current one, e.g. between a catalogue change and
+the end of the rebuild.
+"""
+import mmap
+import os
+import struct
+import threading
+
+from array import array
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+
+from recipes.models import Ingredient, normalize_search_name
+from recipes.versions import get_catalogue_version
+
+MAGIC = b'FGI2'
+SECTIONS = (
+    ('ids', 'q'),
+    ('key_offsets', 'I'),
+    ('keys', None),
+    ('item_offsets', 'I'),
+    ('items', None),
+    ('gram_offsets', 'I'),
+    ('grams', None),
+    ('posting_offsets', 'I'),
+    ('postings', 'I'),
+)
+HEADER = struct.Struct('<4s32s' + 'Q' * len(SECTIONS))
+GRAM_SIZE = 3
+SEPARATOR = b'\x00'
+
+_lock = threading.Lock()
+_index = None
+_building = False
+_pending = False
+
+
+def get_grams(key):
+    return {key[pos:pos + GRAM_SIZE] for pos in range(len(key) - 2)}
+
+
+def pack_strings(values):
+    """Return (offsets, blob) for a list of byte strings."""
+    offsets = array('I', [0])
+    for value in values:
+        offsets.append(offsets[-1] + len(value))
+    return offsets, b''.join(values)
+
+
+def build_snapshot(path=None):
+    """Write the snapshot of the ingredient catalogue atomically."""
+    path = path or settings.INGREDIENT_INDEX_PATH
+    # read before the rows, a change committed meanwhile makes it stale
+    version = get_catalogue_version()
+    # the order of IngredientQuerySet.search: code points, then the id
+    rows = sorted(
+        (
+            (normalize_search_name(name).encode(), name, unit, pk)
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit__name'
+            ).iterator()
+        ),
+        key=lambda row: (row[0], row[1], row[3]),
+    )
+    grams = {}
+    for number, (key, *_) in enumerate(rows):
+        for gram in get_grams(key.decode()):
+            grams.setdefault(gram.encode(), array('I')).append(number)
+    gram_keys = sorted(grams)
+    key_offsets, keys = pack_strings([row[0] for row in rows])
+    item_offsets, items = pack_strings(
+        [f'{name}\x00{unit}'.encode() for _, name, unit, _ in rows]
+    )
+    gram_offsets, gram_blob = pack_strings(gram_keys)
+    posting_offsets = array('I', [0])
+    postings = array('I')
+    for gram in gram_keys:
+        postings.extend(grams[gram])
+        posting_offsets.append(len(postings))
+    sections = (
+        array('q', [row[3] for row in rows]).tobytes(),
+        key_offsets.tobytes(),
+        keys,
+        item_offsets.tobytes(),
+        items,
+        gram_offsets.tobytes(),
+        gram_blob,
+        posting_offsets.tobytes(),
+        postings.tobytes(),
+    )
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as snapshot:
+        snapshot.write(
+            HEADER.pack(MAGIC, version.encode(), *map(len, sections))
+        )
+        for section in sections:
+            snapshot.write(section)
+            snapshot.write(b'\x00' * (-len(section) % 8))
+    os.replace(temp_path, path)
+    return len(rows)
+
+
+class IngredientIndex:
+    """Read-only view of a snapshot file."""
+
+    def __init__(self, path, signature):
+        self.signature = signature
+        with open(path, 'rb') as snapshot:
+            buffer = memoryview(
+                mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+            )
+        magic, version, *sizes = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an ingredient index')
+        self.version = version.rstrip(b'\x00').decode()
+        offset = HEADER.size
+        for (name, typecode), size in zip(SECTIONS, sizes):
+            section = buffer[offset:offset + size]
+            if typecode:
+                section = section.cast(typecode)
+            setattr(self, name, section)
+            offset += size + (-size % 8)
+        self.count = len(self.ids)
+
+    @staticmethod
+    def blob_item(offsets, blob, number):
+        return blob[offsets[number]:offsets[number + 1]].tobytes()
+
+    def key(self, number):
+        return self.blob_item(self.key_offsets, self.keys, number)
+
+    def item(self, number):
+        name, unit = self.blob_item(
+            self.item_offsets, self.items, number
+        ).split(SEPARATOR)
+        return {
+            'id': self.ids[number],
+            'name': name.decode(),
+            'measurement_unit': unit.decode(),
+        }
+
+    def lower_bound(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def gram_postings(self, gram):
+        low, high = 0, len(self.gram_offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            value = self.blob_item(self.gram_offsets, self.grams, middle)
+            if value == gram:
+                return self.postings[
+                    self.posting_offsets[middle]:
+                    self.posting_offsets[middle + 1]
+                ]
+            if value < gram:
+                low = middle + 1
+            else:
+                high = middle
+        return ()
+
+    def candidates(self, string):
+        """Record numbers that may contain string, in index order."""
+        if len(string) < GRAM_SIZE:
+            return range(self.count)
+        return min(
+            (self.gram_postings(gram.encode()) for gram in get_grams(string)),
+            key=len,
+        )
+
+    def search(self, string, limit):
+        """Prefix matches first, then substring matches, like SQL search."""
+        string = normalize_search_name(string)
+        key = string.encode()
+        found = []
+        number = self.lower_bound(key)
+        while (
+            number < self.count
+            and len(found) < limit
+            and self.key(number).startswith(key)
+        ):
+            found.append(number)
+            number += 1
+        if len(found) < limit:
+            found += islice(
+                (
+                    number
+                    for number in self.candidates(string)
+                    if key in self.key(number)
+                    and not self.key(number).startswith(key)
+                ),
+                limit - len(found),
+            )
+        return [self.item(number) for number in found]
+
+
+def _build():
+    global _building, _pending
+    try:
+        while True:
+            with _lock:
+                if not _pending:
+                    _building = False
+                    return
+                _pending = False
+            build_snapshot()
+    except Exception:
+        with _lock:
+            _building = False
+        raise
+    finally:
+        connection.close()
+
+
+def schedule_build():
+    """Rebuild the snapshot in a background thread of this worker.
+
+    A request made while a build runs is not dropped, the running build
+    may have read the rows before the change, so it builds once more.
+    """
+    global _building, _pending
+    with _lock:
+        _pending = True
+        if _building:
+            return
+        _building = True
+    threading.Thread(target=_build, daemon=True).start()
+
+
+def invalidate():
+    """Drop the snapshot so workers use SQL until it is rebuilt."""
+    if not settings.INGREDIENT_INDEX_PATH:
+        return
+    try:
+        os.remove(settings.INGREDIENT_INDEX_PATH)
+    except FileNotFoundError:
+        pass
+    schedule_build()
+
+
+def get_index():
+    global _index
+    path = settings.INGREDIENT_INDEX_PATH
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        schedule_build()
+        return None
+    signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if _index is None or _index.signature != signature:
+            try:
+                _index = IngredientIndex(path, signature)
+            except (OSError, ValueError):
+                _index = None
+        index = _index
+    if index is None or index.version != get_catalogue_version():
+        schedule_build()
+        return None
+    return index
+
+
+def search(string, limit):
+    """Return serialized ingredients or None when SQL must be used."""
+    index = get_index()
+    if index is None:
+        return None
+    return index.search(string, limit)
@@ -0,0 +1,133 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes import search_index
+from recipes.counters import change_counters
+from recipes.media import get_recipe_files, release_files
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingList, Tag, Unit,
+)
+from recipes.renditions import needs_renditions, schedule_renditions
+from recipes.versions import (
+    bump_cart_versions, bump_catalogue_version, bump_relations_versions,
+)
+from users.models import Follow
+
+
+def ingredients_changed():
+    bump_catalogue_version()
+    search_index.invalidate()
+
+
+def recipe_ingredients_changed(recipe_id):
+    """Invalidate carts of every user who has the recipe in the cart."""
+    bump_cart_versions(
+        ShoppingList.objects.filter(recipe_id=recipe_id).values_list(
+            'user_id', flat=True
+        )
+    )
+
+
+def records_changed(model, user_id, field_name, values, delta):
+    """Do what the signals do for records changed by raw statements."""
+    if not values:
+        return
+    field = model._meta.get_field(field_name)
+    change_counters(
+        model,
+        [model(user_id=user_id, **{field.attname: value}) for value in values],
+        delta,
+    )
+    transaction.on_commit(lambda: bump_relations_versions((user_id,)))
+    if model is ShoppingList:
+        transaction.on_commit(lambda: bump_cart_versions((user_id,)))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Unit)
+def invalidate_ingredient_index(sender, **kwargs):
+    transaction.on_commit(ingredients_changed)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver((post_save, post_delete), sender=ShoppingList)
+def invalidate_cart(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_cart_versions((instance.user_id,)))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingList)
+@receiver((post_save, post_delete), sender=Follow)
+def invalidate_relations(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: bump_relations_versions((instance.user_id,))
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_recipe_carts(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: recipe_ingredients_changed(instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def render_recipe_image(sender, instance, raw=False, **kwargs):
+    if not raw and needs_renditions(instance):
+        schedule_renditions(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_files(sender, instance, **kwargs):
+    files = get_recipe_files(instance)
+    transaction.on_commit(lambda: release_files(files))
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_files(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    stored = (
+        Recipe.objects.filter(pk=instance.pk)
+        .only('image', 'image_renditions')
+        .first()
+    )
+    instance._stored_files = get_recipe_files(stored) if stored else set()
+
+
+@receiver(post_save, sender=Recipe)
+def release_replaced_files(sender, instance, **kwargs):
+    files = getattr(instance, '_stored_files', set()) - get_recipe_files(
+        instance
+    )
+    instance._stored_files = set()
+    if files:
+        transaction.on_commit(lambda: release_files(files))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_recipe_ingredient_carts(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: recipe_ingredients_changed(instance.recipe_id)
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Follow)
+def increment_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counters(sender, (instance,), 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Follow)
+def decrement_counters(sender, instance, **kwargs):
+    change_counters(sender, (instance,), -1)
@@ -0,0 +1,71 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.models import CacheVersion
+
+CATALOGUE_VERSION_KEY = 'catalogue_version'
+CART_VERSION_KEY = 'cart_version:{}'
+RELATIONS_VERSION_KEY = 'relations_version:{}'
+
+
+def get_version(key):
+    """Return the version stamp stored under key, creating it if missing.
+
+    A random stamp instead of a counter keeps ETags safe after the cache
+    is flushed or restarted. Stamps expire after CACHE_VERSION_TIMEOUT, so
+    a worker that missed a bump made by another one starts a new version.
+    """
+    version = cache.get(key)
+    if version is not None:
+        return version
+    cache.add(key, uuid4().hex, settings.CACHE_VERSION_TIMEOUT)
+    return cache.get(key)
+
+
+def get_catalogue_version():
+    """Version of tags, ingredients and units.
+
+    It is stored in the database, so a stamp expired from a local cache is
+    read again unchanged and every worker builds the same ETags.
+    """
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is not None:
+        return version
+    version = CacheVersion.objects.get_or_create(
+        key=CATALOGUE_VERSION_KEY, defaults={'value': uuid4().hex}
+    )[0].value
+    # add, a bump made meanwhile must not be overwritten
+    cache.add(CATALOGUE_VERSION_KEY, version, settings.CACHE_VERSION_TIMEOUT)
+    return version
+
+
+def bump_catalogue_version():
+    version = uuid4().hex
+    CacheVersion.objects.update_or_create(
+        key=CATALOGUE_VERSION_KEY, defaults={'value': version}
+    )
+    cache.set(CATALOGUE_VERSION_KEY, version, settings.CACHE_VERSION_TIMEOUT)
+
+
+def get_cart_version(user_id):
+    """Version of the shopping cart content of a user."""
+    return get_version(CART_VERSION_KEY.format(user_id))
+
+
+def bump_cart_versions(user_ids):
+    cache.delete_many(
+        [CART_VERSION_KEY.format(user_id) for user_id in user_ids]
+    )
+
+
+def get_relations_version(user_id):
+    """Version of favorites, shopping cart and follows of a user."""
+    return get_version(RELATIONS_VERSION_KEY.format(user_id))
+
+
+def bump_relations_versions(user_ids):
+    cache.delete_many(
+        [RELATIONS_VERSION_KEY.format(user_id) for user_id in user_ids]
+    )
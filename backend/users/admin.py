@@ -18,3 +18,4 @@ class FollowAdmin(admin.ModelAdmin):
 class UserAdmin(admin.ModelAdmin):
     list_filter = ('username', 'email')
     search_fields = ('username', 'email')
+    readonly_fields = ('recipes_count', 'followers_count')
@@ -0,0 +1,155 @@
+"""Token authentication with cached token lookups.
+
+TokenAuthentication joins Token and User on every request. Here the user
+row behind a token is kept in a bounded per-process LRU for
+TOKEN_CACHE_TIMEOUT seconds and, with TOKEN_CACHE_SHARED, in the default
+cache as well, so workers share the lookups. Signals drop the entries on
+logout, token deletion and user changes. The shared cache and the LRU of
+the current process are cleared at once, the LRU of other workers keeps a
+stale entry for at most TOKEN_CACHE_TIMEOUT.
+
+Only AUTH_FIELDS are cached: no password hash, no counters updated without
+signals. The other fields of the user stay deferred, so saving it writes
+the loaded fields only and cannot put back stale values.
+"""
+import hashlib
+import threading
+import time
+
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+User = get_user_model()
+
+TOKEN_CACHE_KEY = 'auth_token:{}'
+AUTH_FIELDS = (
+    'id',
+    'username',
+    'email',
+    'first_name',
+    'last_name',
+    'is_active',
+    'is_staff',
+    'is_superuser',
+)
+
+
+def get_cache_key(key):
+    # tokens are credentials, they are not sent to the cache server as is
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def get_user_values(user):
+    return {name: getattr(user, name) for name in AUTH_FIELDS}
+
+
+class TokenCache:
+    """Bounded LRU of token key -> user field values with a TTL."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.stats = Counter()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[1]
+            self.entries.pop(key, None)
+        values = None
+        if settings.TOKEN_CACHE_SHARED:
+            values = cache.get(get_cache_key(key))
+        with self.lock:
+            self.stats['shared_hits' if values else 'misses'] += 1
+        if values:
+            self.set(key, values, shared=False)
+        return values
+
+    def set(self, key, values, shared=True):
+        with self.lock:
+            self.entries[key] = (
+                time.monotonic() + settings.TOKEN_CACHE_TIMEOUT,
+                values,
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+        if shared and settings.TOKEN_CACHE_SHARED:
+            cache.set(
+                get_cache_key(key), values, settings.TOKEN_CACHE_TIMEOUT
+            )
+
+    def delete(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.delete_many([get_cache_key(key) for key in keys])
+
+    def delete_user(self, user_id, keys=()):
+        """Drop entries of a user, keys are needed for the shared cache."""
+        with self.lock:
+            keys = {
+                key
+                for key, (_, values) in self.entries.items()
+                if values['id'] == user_id
+            } | set(keys)
+        self.delete(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.stats.clear()
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'hits': self.stats['hits'],
+                'shared_hits': self.stats['shared_hits'],
+                'misses': self.stats['misses'],
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        values = token_cache.get(key)
+        if values is None:
+            try:
+                token = (
+                    model.objects.select_related('user')
+                    .only('key', *(f'user__{name}' for name in AUTH_FIELDS))
+                    .get(key=key)
+                )
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            values = get_user_values(token.user)
+            token_cache.set(key, values)
+        # from_db takes the loaded values in the order of the model fields
+        names = [
+            field.attname
+            for field in User._meta.concrete_fields
+            if field.attname in values
+        ]
+        user = User.from_db(
+            User.objects.db, names, [values[name] for name in names]
+        )
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return user, model(key=key, user=user)
@@ -4,6 +4,8 @@ from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from recipes.counters import CounterQuerySet
+
 
 class User(AbstractUser):
     """Foodgram User Model"""
@@ -39,6 +41,12 @@ class User(AbstractUser):
     password = models.CharField(
         _('password'), max_length=settings.USER_NAME_MAX_LENGTH
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Подписчиков'
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -62,6 +70,9 @@ class Follow(models.Model):
         verbose_name='авторы',
     )
 
+    objects = CounterQuerySet.as_manager()
+    counters = (('author', 'followers_count'),)
+
     class Meta:
         verbose_name = 'подписка'
         verbose_name_plural = 'Подписки'
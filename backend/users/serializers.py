@@ -1,10 +1,10 @@
 from django.contrib.auth import get_user_model
-from django.utils.datastructures import MultiValueDictKeyError
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import LowercaseEmailField
 from rest_framework import serializers
 
-from api.utils import get_recipe_serializer
+from api.utils import get_recipe_serializer, get_recipes_limit
+from recipes.relations import get_relations
 
 User = get_user_model()
 
@@ -29,9 +29,7 @@ class CustomUserSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return obj.following.filter(user_id=user.id).exists()
+        return obj.id in get_relations(user).follows
 
     class Meta:
         model = User
@@ -47,15 +45,16 @@ class CustomUserSerializer(UserSerializer):
 
 class SubscriptionSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     def get_recipes(self, obj):
-        author_recipes = obj.recipes.all()
-        try:
-            recipes_limit = self.context.get('request').GET['recipes_limit']
-            author_recipes = author_recipes[: int(recipes_limit)]
-        except (MultiValueDictKeyError, ValueError):
-            pass
+        if hasattr(obj, 'latest_recipes'):
+            author_recipes = obj.latest_recipes
+        else:
+            author_recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit is not None:
+                author_recipes = author_recipes[:recipes_limit]
 
         if author_recipes:
             serializer = get_recipe_serializer()(
@@ -66,10 +65,6 @@ class SubscriptionSerializer(CustomUserSerializer):
 
         return []
 
-    @staticmethod
-    def get_recipes_count(obj):
-        return obj.recipes.count()
-
     class Meta:
         model = User
         fields = (
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import token_cache
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    # the key is the primary key, deletion resets it on the instance
+    keys = [instance.key]
+    transaction.on_commit(lambda: token_cache.delete(keys))
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, raw, update_fields, **kwargs):
+    """Password, activity or profile changes must reach cached users."""
+    if raw or update_fields and set(update_fields) == {'last_login'}:
+        return
+    keys = []
+    if settings.TOKEN_CACHE_SHARED:
+        keys = list(
+            Token.objects.filter(user=instance).values_list('key', flat=True)
+        )
+    user_id = instance.pk
+    transaction.on_commit(lambda: token_cache.delete_user(user_id, keys))
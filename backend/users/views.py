@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from djoser.views import UserViewSet
 from rest_framework import exceptions
@@ -5,8 +6,12 @@ from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 
+from api.fast_serializers import USER_FIELDS, serialize_subscriptions
 from api.pagination import CustomPageNumberPagination
-from api.utils import create_or_delete_record
+from api.utils import (
+    create_or_delete_record, get_latest_recipes, get_recipes_limit,
+)
+from users.models import Follow
 from users.serializers import SubscriptionSerializer
 
 User = get_user_model()
@@ -15,6 +20,7 @@ User = get_user_model()
 class CustomUserViewSet(UserViewSet):
     permission_classes = (IsAuthenticated,)
     pagination_class = CustomPageNumberPagination
+    keyset_ordering = ('username', 'id')
 
     @action(
         detail=False,
@@ -24,10 +30,24 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         authors = self.request.user.follower.values('author__id')
-        queryset = User.objects.filter(pk__in=authors)
-        serializer = self.get_serializer(
-            self.paginate_queryset(queryset), many=True
+        queryset = User.objects.filter(pk__in=authors).order_by(
+            *User._meta.ordering, 'id'
         )
+        if settings.FAST_LIST_SERIALIZERS:
+            page = self.paginate_queryset(queryset.values(*USER_FIELDS))
+            latest_recipes = get_latest_recipes(
+                [author['id'] for author in page], get_recipes_limit(request)
+            )
+            return self.get_paginated_response(
+                serialize_subscriptions(page, latest_recipes, request)
+            )
+        page = self.paginate_queryset(queryset)
+        latest_recipes = get_latest_recipes(
+            [author.id for author in page], get_recipes_limit(request)
+        )
+        for author in page:
+            author.latest_recipes = latest_recipes[author.id]
+        serializer = self.get_serializer(page, many=True)
 
         return self.get_paginated_response(serializer.data)
 
@@ -39,13 +59,12 @@ class CustomUserViewSet(UserViewSet):
     def subscribe(self, request, id=None):
         user = self.request.user
         author = get_object_or_404(User, pk=id)
-        in_follow = user.follower.filter(author=author)
         if request.method == 'POST' and user == author:
             raise exceptions.ValidationError('you can`t subscribe to yourself')
 
         return create_or_delete_record(
             request=request,
-            record=in_follow,
+            model=Follow,
             serializer_data=self.get_serializer(author).data,
             params={'author': author},
         )